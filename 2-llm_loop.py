@@ -1,8 +1,11 @@
 import boto3
 import os
+import sys
+from bedrock_streaming import StreamPrinter, stream_converse
 
 # Set Parameters
 model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
+stream = "--stream" in sys.argv  # print the response as it is generated
 
 # Initialize AWS Bedrock client
 bedrock_runtime = boto3.client(
@@ -23,7 +26,7 @@ while True:
     # Make the API call using Converse API
     try:
         print("🤖 System call")
-        response = bedrock_runtime.converse(
+        request = dict(
             modelId=model_id,
             messages=[
                 {
@@ -34,6 +37,16 @@ while True:
             inferenceConfig={"maxTokens": 1024}
         )
         
+        if stream:
+            # Print text deltas as they arrive
+            printer = StreamPrinter("\nResponse:\n")
+            result = stream_converse(bedrock_runtime, on_text=printer, **request)
+            printer.finish()
+            print(f"{result.timing_report()}\n")
+            continue
+        
+        response = bedrock_runtime.converse(**request)
+        
         # Extract and print the response
         output = response['output']['message']['content'][0]['text']
         print(f"👤 Query: {query}")
@@ -41,4 +54,3 @@ while True:
         
     except Exception as e:
         print(f"Error calling Bedrock: {e}\n")
-
@@ -2,11 +2,17 @@ import boto3
 import json
 import os
 import re
+import sys
 from datetime import datetime
+from bedrock_streaming import StreamPrinter, stream_converse
+from profiling import Profiler
+from prompt_cache import CacheStats, cached_system
 
 
 # Set Paramters:
 model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
+stream = "--stream" in sys.argv  # stream responses and start tools before the stream ends
+profile = "--profile" in sys.argv  # time each stage of every turn
 
 # Initialize AWS Bedrock client
 bedrock_runtime = boto3.client(
@@ -14,6 +20,15 @@ bedrock_runtime = boto3.client(
     region_name=os.getenv("AWS_REGION", "us-east-1")
 )
 
+# Prints streamed text deltas (used with --stream)
+printer = StreamPrinter("Agent: ")
+
+# Stage timers (used with --profile; no-ops otherwise)
+profiler = Profiler(enabled=profile)
+
+# Prompt-cache token counts (see prompt_cache.py)
+cache_stats = CacheStats()
+
 # Define Tools
 def calculate_expression(expression):
     """Calculator: Evaluate a mathematical expression"""
@@ -57,7 +72,7 @@ def call_llm(user_input, system_message, model_id=model_id):
     try:
         response = bedrock_runtime.converse(
             modelId=model_id,
-            system=[{"text": system_message}],
+            system=cached_system(system_message),
             messages=[
                 {
                     "role": "user",
@@ -66,11 +81,39 @@ def call_llm(user_input, system_message, model_id=model_id):
             ],
             inferenceConfig={"maxTokens": 1024}
         )
+        print(cache_stats.add(response.get("usage")))
         return response['output']['message']['content'][0]['text']
     except Exception as e:
         print(f"Error calling Bedrock: {e}")
         return None
 
+def call_llm_stream(user_input, system_message, model_id=model_id):
+    """Streaming LLM call: prints prose as it arrives and starts a tool as soon as its JSON is complete"""
+    try:
+        printer.reset()
+        result = stream_converse(
+            bedrock_runtime,
+            on_text=printer,
+            on_tool=profiled_call_tool,
+            modelId=model_id,
+            system=cached_system(system_message),
+            messages=[
+                {
+                    "role": "user",
+                    "content": [{"text": user_input}]
+                }
+            ],
+            inferenceConfig={"maxTokens": 1024}
+        )
+        printer.finish()
+        print(result.timing_report())
+        print(cache_stats.add(result.usage))
+        return result
+    except Exception as e:
+        printer.finish()
+        print(f"Error calling Bedrock: {e}")
+        return None
+
 def call_tool(tool_name, tool_input):
     """Execute a tool function based on tool name"""
     if tool_name == "calculator":
@@ -89,50 +132,66 @@ def call_tool(tool_name, tool_input):
     else:
         return f"Unknown tool: {tool_name}"
 
+def profiled_call_tool(tool_name, tool_input):
+    """call_tool inside a "call_tool" span (streaming starts it early, on a worker thread)"""
+    with profiler.span("call_tool"):
+        return call_tool(tool_name, tool_input)
+
 def query_claude(user_input):
     # System message for tool selection and general conversation
-    system_message = (
-        "You're a helpful personal assistant. Based on the user's message, "
-        "decide if you need to use a tool or respond directly.\n\n"
-        "If you need a tool, respond ONLY with a JSON object:\n"
-        "{ \"tool\": \"calculator\", \"input\": \"5 * (4 + 3)\" }\n"
-        "or\n"
-        "{ \"tool\": \"get_weather\", \"input\": \"New York\" }\n"
-        "or\n"
-        "{ \"tool\": \"get_date\", \"input\": \"\" }\n"
-        "or\n"
-        "{ \"tool\": \"get_time\", \"input\": \"\" }\n\n"
-        "If no tool is needed, respond naturally with a helpful message (NOT JSON)."
-    )
+    with profiler.span("prompt_assembly"):
+        system_message = (
+            "You're a helpful personal assistant. Based on the user's message, "
+            "decide if you need to use a tool or respond directly.\n\n"
+            "If you need a tool, respond ONLY with a JSON object:\n"
+            "{ \"tool\": \"calculator\", \"input\": \"5 * (4 + 3)\" }\n"
+            "or\n"
+            "{ \"tool\": \"get_weather\", \"input\": \"New York\" }\n"
+            "or\n"
+            "{ \"tool\": \"get_date\", \"input\": \"\" }\n"
+            "or\n"
+            "{ \"tool\": \"get_time\", \"input\": \"\" }\n\n"
+            "If no tool is needed, respond naturally with a helpful message (NOT JSON)."
+        )
     
     # Single LLM call
     print("🤖 System call")
-    content = call_llm(user_input, system_message)
+    with profiler.span("converse"):
+        if stream:
+            result = call_llm_stream(user_input, system_message)
+            content = result.text if result else None
+        else:
+            result = None
+            content = call_llm(user_input, system_message)
     if content is None:
         return "Error: Could not connect to the LLM."
     
     # Try to extract JSON from response (if a tool is needed)
-    tool = None
-    tool_input = None
+    with profiler.span("parse_tool_call"):
+        tool = None
+        tool_input = None
     
-    try:
-        tool_call = json.loads(content)
-        tool = tool_call.get("tool")
-        tool_input = tool_call.get("input")
-    except:
-        # Try to extract JSON if it's wrapped in markdown or other text
-        json_match = re.search(r'\{[^}]+\}', content)
-        if json_match:
-            try:
-                tool_call = json.loads(json_match.group())
-                tool = tool_call.get("tool")
-                tool_input = tool_call.get("input")
-            except:
-                pass
+        try:
+            tool_call = json.loads(content)
+            tool = tool_call.get("tool")
+            tool_input = tool_call.get("input")
+        except:
+            # Try to extract JSON if it's wrapped in markdown or other text
+            json_match = re.search(r'\{[^}]+\}', content)
+            if json_match:
+                try:
+                    tool_call = json.loads(json_match.group())
+                    tool = tool_call.get("tool")
+                    tool_input = tool_call.get("input")
+                except:
+                    pass
     
-    # Execute tools if a tool was selected
-    if tool:
-        return call_tool(tool, tool_input)
+    # Execute tools if a tool was selected (reuse the result if streaming already ran it)
+    if result and result.tool_call:
+        return result.tool_result
+    elif tool:
+        with profiler.span("call_tool"):
+            return call_tool(tool, tool_input)
     else:
         # No tool needed - return the LLM's natural language response
         return content
@@ -142,6 +201,13 @@ while True:
     user_input = input("👤 You: ")
     if user_input.lower() == "quit":
         print("Agent: Goodbye!")
+        profiler.save()
+        print(cache_stats.summary())
         break
-    print("Agent:", query_claude(user_input))
+    with profiler.turn():
+        response = query_claude(user_input)
+    if not printer.showed(response):
+        print("Agent:", response)
+    if profile:
+        print(profiler.turn_summary())
 
@@ -2,11 +2,19 @@ import boto3
 import json
 import os
 import re
+import sys
 from datetime import datetime
+from bedrock_streaming import StreamPrinter, stream_converse
+from profiling import Profiler
+from prompt_cache import CacheStats, cache_aligned_window, cached_system, with_history_cache_point
+from long_term_memory import LongTermMemory
+from message_store import MessageStore
 
 
 # Set Paramters:
 model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
+stream = "--stream" in sys.argv  # stream responses and start tools before the stream ends
+profile = "--profile" in sys.argv  # time each stage of every turn
 
 # Initialize AWS Bedrock client
 bedrock_runtime = boto3.client(
@@ -14,6 +22,19 @@ bedrock_runtime = boto3.client(
     region_name=os.getenv("AWS_REGION", "us-east-1")
 )
 
+# Prints streamed text deltas (used with --stream)
+printer = StreamPrinter("Agent: ")
+
+# Stage timers (used with --profile; no-ops otherwise)
+profiler = Profiler(enabled=profile)
+
+# Prompt-cache token counts (see prompt_cache.py)
+cache_stats = CacheStats()
+
+# Long-term memory: only the most relevant past turns are sent, plus a short recent window
+long_term_memory = LongTermMemory()
+recent_window = 6  # messages (3 exchanges); trimmed in whole windows to keep the cached prefix stable
+
 # Define Tools
 def calculate_expression(expression):
     """Calculator: Evaluate a mathematical expression"""
@@ -55,12 +76,8 @@ def get_time(location=None):
 def call_llm(user_input, system_message, conversation_history=[], model_id=model_id):
     """Single LLM call function with conversation history"""
     try:
-        # Build messages list with conversation history
-        messages = []
-        
-        # Add previous conversation history
-        for msg in conversation_history:
-            messages.append(msg)
+        # Build messages list with conversation history (the MessageStore window's dicts are reused)
+        messages = list(conversation_history)
         
         # Add current user message
         messages.append({
@@ -70,15 +87,43 @@ def call_llm(user_input, system_message, conversation_history=[], model_id=model
         
         response = bedrock_runtime.converse(
             modelId=model_id,
-            system=[{"text": system_message}],
-            messages=messages,
+            system=cached_system(system_message),
+            messages=with_history_cache_point(messages),
             inferenceConfig={"maxTokens": 1024}
         )
+        print(cache_stats.add(response.get("usage")))
         return response['output']['message']['content'][0]['text']
     except Exception as e:
         print(f"Error calling Bedrock: {e}")
         return None
 
+def call_llm_stream(user_input, system_message, conversation_history=[], model_id=model_id):
+    """Streaming LLM call: prints prose as it arrives and starts a tool as soon as its JSON is complete"""
+    try:
+        messages = list(conversation_history)
+        messages.append({
+            "role": "user",
+            "content": [{"text": user_input}]
+        })
+        printer.reset()
+        result = stream_converse(
+            bedrock_runtime,
+            on_text=printer,
+            on_tool=profiled_call_tool,
+            modelId=model_id,
+            system=cached_system(system_message),
+            messages=with_history_cache_point(messages),
+            inferenceConfig={"maxTokens": 1024}
+        )
+        printer.finish()
+        print(result.timing_report())
+        print(cache_stats.add(result.usage))
+        return result
+    except Exception as e:
+        printer.finish()
+        print(f"Error calling Bedrock: {e}")
+        return None
+
 def call_tool(tool_name, tool_input):
     """Execute a tool function based on tool name"""
     if tool_name == "calculator":
@@ -97,79 +142,102 @@ def call_tool(tool_name, tool_input):
     else:
         return f"Unknown tool: {tool_name}"
 
+def profiled_call_tool(tool_name, tool_input):
+    """call_tool inside a "call_tool" span (streaming starts it early, on a worker thread)"""
+    with profiler.span("call_tool"):
+        return call_tool(tool_name, tool_input)
+
 def update_memory(conversation_history, user_input, response):
-    """Update conversation history with user message and assistant response"""
-    updated_history = conversation_history.copy()
-    updated_history.append({
-        "role": "user",
-        "content": [{"text": user_input}]
-    })
-    updated_history.append({
-        "role": "assistant",
-        "content": [{"text": response}]
-    })
-    return updated_history
-
-def query_claude(user_input, conversation_history=[]):
+    """Append the user message and assistant response to the history (in place, no copy)"""
+    conversation_history.add_turn(user_input, response)
+    return conversation_history
+
+def query_claude(user_input, conversation_history):
     # System message for tool selection and general conversation
-    system_message = (
-        "You're a helpful personal assistant. Based on the user's message, "
-        "decide if you need to use a tool or respond directly.\n\n"
-        "If you need a tool, respond ONLY with a JSON object:\n"
-        "{ \"tool\": \"calculator\", \"input\": \"5 * (4 + 3)\" }\n"
-        "or\n"
-        "{ \"tool\": \"get_weather\", \"input\": \"New York\" }\n"
-        "or\n"
-        "{ \"tool\": \"get_date\", \"input\": \"\" }\n"
-        "or\n"
-        "{ \"tool\": \"get_time\", \"input\": \"\" }\n\n"
-        "If no tool is needed, respond naturally with a helpful message (NOT JSON)."
-    )
+    with profiler.span("prompt_assembly"):
+        system_message = (
+            "You're a helpful personal assistant. Based on the user's message, "
+            "decide if you need to use a tool or respond directly.\n\n"
+            "If you need a tool, respond ONLY with a JSON object:\n"
+            "{ \"tool\": \"calculator\", \"input\": \"5 * (4 + 3)\" }\n"
+            "or\n"
+            "{ \"tool\": \"get_weather\", \"input\": \"New York\" }\n"
+            "or\n"
+            "{ \"tool\": \"get_date\", \"input\": \"\" }\n"
+            "or\n"
+            "{ \"tool\": \"get_time\", \"input\": \"\" }\n\n"
+            "If no tool is needed, respond naturally with a helpful message (NOT JSON)."
+        )
+    
+    # Recall relevant turns from long-term memory
+    # (sent with the user turn, not the system prompt, so the system prompt stays cacheable)
+    with profiler.span("memory_recall"):
+        recalled = long_term_memory.recall_block(user_input)
+        llm_input = f"{recalled}\n\nUser message: {user_input}" if recalled else user_input
+        recent_history = cache_aligned_window(conversation_history, recent_window)
     
-    # Single LLM call with conversation history
+    # Single LLM call with recent conversation history
     print("🤖 System call")
-    content = call_llm(user_input, system_message, conversation_history)
+    with profiler.span("converse"):
+        if stream:
+            result = call_llm_stream(llm_input, system_message, recent_history)
+            content = result.text if result else None
+        else:
+            result = None
+            content = call_llm(llm_input, system_message, recent_history)
     if content is None:
         return "Error: Could not connect to the LLM.", conversation_history
     
     # Try to extract JSON from response (if a tool is needed)
-    tool = None
-    tool_input = None
+    with profiler.span("parse_tool_call"):
+        tool = None
+        tool_input = None
     
-    try:
-        tool_call = json.loads(content)
-        tool = tool_call.get("tool")
-        tool_input = tool_call.get("input")
-    except:
-        # Try to extract JSON if it's wrapped in markdown or other text
-        json_match = re.search(r'\{[^}]+\}', content)
-        if json_match:
-            try:
-                tool_call = json.loads(json_match.group())
-                tool = tool_call.get("tool")
-                tool_input = tool_call.get("input")
-            except:
-                pass
+        try:
+            tool_call = json.loads(content)
+            tool = tool_call.get("tool")
+            tool_input = tool_call.get("input")
+        except:
+            # Try to extract JSON if it's wrapped in markdown or other text
+            json_match = re.search(r'\{[^}]+\}', content)
+            if json_match:
+                try:
+                    tool_call = json.loads(json_match.group())
+                    tool = tool_call.get("tool")
+                    tool_input = tool_call.get("input")
+                except:
+                    pass
     
-    # Execute tools if a tool was selected
-    if tool:
-        response = call_tool(tool, tool_input)
+    # Execute tools if a tool was selected (reuse the result if streaming already ran it)
+    if result and result.tool_call:
+        response = result.tool_result
+    elif tool:
+        with profiler.span("call_tool"):
+            response = call_tool(tool, tool_input)
     else:
         # No tool needed - return the LLM's natural language response
         response = content
     
     # Update conversation history with user message and assistant response
-    updated_history = update_memory(conversation_history, user_input, response)
+    with profiler.span("memory_update"):
+        updated_history = update_memory(conversation_history, user_input, response)
+        long_term_memory.remember(user_input, response)
     
     return response, updated_history
 
 print("Welcome! I'm your personal assistant. I can tell you the current date, time, and weather. I can also calculate mathematical expressions. Type 'quit' to stop.")
-conversation_history = []
+conversation_history = MessageStore()
 while True:
     user_input = input("👤 You: ")
     if user_input.lower() == "quit":
         print("Agent: Goodbye!")
+        profiler.save()
+        print(cache_stats.summary())
         break
-    response, conversation_history = query_claude(user_input, conversation_history)
-    print("Agent:", response)
+    with profiler.turn():
+        response, conversation_history = query_claude(user_input, conversation_history)
+    if not printer.showed(response):
+        print("Agent:", response)
+    if profile:
+        print(profiler.turn_summary())
 
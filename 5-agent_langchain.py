@@ -4,6 +4,7 @@ from datetime import datetime
 from langchain_aws import ChatBedrock
 from langchain.tools import tool
 from langchain.agents import create_agent
+from prompt_cache import CacheStats, caching_middleware
 
 # Set Parameters
 model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
@@ -11,9 +12,13 @@ model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
 # Initialize Bedrock LLM
 llm = ChatBedrock(
     model_id=model_id,
-    region_name=os.getenv("AWS_REGION", "us-east-1")
+    region_name=os.getenv("AWS_REGION", "us-east-1"),
+    beta_use_converse_api=True  # Converse API: needed for prompt-cache checkpoints
 )
 
+# Prompt-cache token counts (see prompt_cache.py)
+cache_stats = CacheStats()
+
 # Define Tools
 @tool
 def calculate_expression(expression: str) -> str:
@@ -65,7 +70,8 @@ tools = [calculate_expression, get_weather, get_date, get_time]
 agent = create_agent(
     model=llm,
     tools=tools,
-    system_prompt="You are a helpful personal assistant. I can tell you the current date, time, and weather. I can also calculate mathematical expressions."
+    system_prompt="You are a helpful personal assistant. I can tell you the current date, time, and weather. I can also calculate mathematical expressions.",
+    middleware=[caching_middleware()]
 )
 
 print("Welcome! I'm your personal assistant. I can tell you the current date, time, and weather. I can also calculate mathematical expressions. Type 'quit' to stop.")
@@ -73,9 +79,11 @@ while True:
     user_input = input("👤 You: ")
     if user_input.lower() == "quit":
         print("Agent: Goodbye!")
+        print(cache_stats.summary())
         break
     print("🤖 System call")
     response = agent.invoke(
         {"messages": [{"role": "user", "content": user_input}]}
     )
     print("Agent:", response["messages"][-1].content)
+    print(cache_stats.add_langchain(response["messages"]))
@@ -4,7 +4,9 @@ from datetime import datetime
 from langchain_aws import ChatBedrock
 from langchain.tools import tool
 from langchain.agents import create_agent
+from prompt_cache import CacheStats, caching_middleware
 from langgraph.checkpoint.memory import InMemorySaver
+from long_term_memory import LongTermMemory, memory_middleware
 
 # Set Parameters
 model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
@@ -12,9 +14,17 @@ model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
 # Initialize Bedrock LLM
 llm = ChatBedrock(
     model_id=model_id,
-    region_name=os.getenv("AWS_REGION", "us-east-1")
+    region_name=os.getenv("AWS_REGION", "us-east-1"),
+    beta_use_converse_api=True  # Converse API: needed for prompt-cache checkpoints
 )
 
+# Prompt-cache token counts (see prompt_cache.py)
+cache_stats = CacheStats()
+
+# Long-term memory: recalls relevant turns from earlier sessions
+long_term_memory = LongTermMemory()
+recent_turns = 3  # exchanges of the thread sent per call; older ones come back only through recall
+
 # Define Tools
 @tool
 def calculate_expression(expression: str) -> str:
@@ -67,6 +77,8 @@ agent = create_agent(
     model=llm,
     tools=tools,
     system_prompt="You are a helpful personal assistant. I can tell you the current date, time, and weather. I can also calculate mathematical expressions.",
+    # Recalled notes and the recent-window trim are applied per model call, not stored in the thread
+    middleware=[caching_middleware(), memory_middleware(long_term_memory, recent_turns)],
     checkpointer=InMemorySaver()
 )
 
@@ -75,10 +87,14 @@ while True:
     user_input = input("👤 You: ")
     if user_input.lower() == "quit":
         print("Agent: Goodbye!")
+        print(cache_stats.summary())
         break
     print("🤖 System call")
     response = agent.invoke(
         {"messages": [{"role": "user", "content": user_input}]},
         {"configurable": {"thread_id": "1"}}
     )
-    print("Agent:", response["messages"][-1].content)
+    answer = response["messages"][-1].content
+    long_term_memory.remember(user_input, answer)
+    print("Agent:", answer)
+    print(cache_stats.add_langchain(response["messages"]))
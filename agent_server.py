@@ -0,0 +1,394 @@
+# HTTP server for the Bedrock agents (standard library asyncio, no web framework)
+# Usage: python agent_server.py [--port 8080]
+#   curl -N localhost:8080/tool-agent/chat -d '{"thread_id": "alice", "message": "weather in Paris?"}'
+#   curl -N localhost:8080/langchain-agent/chat -d '{"thread_id": "bob", "message": "what is 5 * (4 + 3)?"}'
+#   curl localhost:8080/health
+#   curl localhost:8080/metrics
+# Chat responses stream as newline-delimited JSON events:
+#   {"type": "text", "text": ...}, {"type": "tool", "name": ..., "result": ...},
+#   then {"type": "done", ...timings} or {"type": "error", "error": ...}
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import boto3
+from botocore.config import Config
+from langchain_aws import ChatBedrock
+from langchain.tools import tool
+from langchain.agents import create_agent
+from langgraph.checkpoint.memory import InMemorySaver
+
+from bedrock_streaming import StreamCancelled, stream_converse
+from message_store import MessageStore
+from prompt_cache import cache_aligned_window, cached_system, caching_middleware, with_history_cache_point
+
+# Set Parameters
+model_id = "us.anthropic.claude-sonnet-4-5-20250929-v1:0"
+host = os.getenv("AGENT_SERVER_HOST", "127.0.0.1")
+port = int(os.getenv("AGENT_SERVER_PORT", "8080"))
+max_concurrent = int(os.getenv("AGENT_SERVER_MAX_CONCURRENT", "32"))  # model calls in flight
+request_timeout = float(os.getenv("AGENT_SERVER_TIMEOUT", "60"))       # seconds per chat request
+session_ttl = 30 * 60   # idle seconds before a thread's state is dropped
+max_body = 64 * 1024
+recent_window = 6       # messages of history sent by the tool agent
+
+# Shared clients: one connection pool and one compiled graph for every session
+bedrock_runtime = boto3.client(
+    'bedrock-runtime',
+    region_name=os.getenv("AWS_REGION", "us-east-1"),
+    config=Config(max_pool_connections=max_concurrent, read_timeout=request_timeout)
+)
+llm = ChatBedrock(
+    model_id=model_id,
+    client=bedrock_runtime,
+    region_name=os.getenv("AWS_REGION", "us-east-1"),
+    beta_use_converse_api=True
+)
+# Blocking boto3 calls run here, off the event loop
+executor = ThreadPoolExecutor(max_workers=max_concurrent * 2, thread_name_prefix="agent")
+
+
+# Define Tools
+def calculate_expression(expression: str) -> str:
+    """Calculator: Evaluate a mathematical expression"""
+    safe_expr = re.sub(r'[^0-9+\-*/(). ]', '', expression or "")
+    if safe_expr.strip() == "":
+        return "I couldn't compute that."
+    try:
+        return f"The result is: {eval(safe_expr)}"
+    except:
+        return "I couldn't compute that."
+
+def get_weather(location: str) -> str:
+    """Weather: Get weather information for a location"""
+    weather_data = {
+        "new york": "Sunny, 72°F",
+        "london": "Cloudy, 58°F",
+        "tokyo": "Rainy, 65°F",
+        "paris": "Partly cloudy, 68°F"
+    }
+    location_lower = (location or "").lower()
+    for city, weather in weather_data.items():
+        if city in location_lower:
+            return f"Weather in {city.title()}: {weather}"
+    return f"Weather information for {location} is not available in simulation."
+
+def get_date(location: str = "") -> str:
+    """Get Date: Get the current date"""
+    return f"Today's date is: {datetime.now().strftime('%A, %B %d, %Y')}"
+
+def get_time(location: str = "") -> str:
+    """Get Time: Get the current time"""
+    return f"The current time is: {datetime.now().strftime('%I:%M:%S %p')}"
+
+TOOLS = {
+    "calculator": calculate_expression,
+    "get_weather": get_weather,
+    "get_date": get_date,
+    "get_time": get_time,
+}
+
+def call_tool(tool_name, tool_input):
+    """Execute a tool function based on tool name"""
+    if tool_name not in TOOLS:
+        return f"Unknown tool: {tool_name}"
+    return TOOLS[tool_name](tool_input)
+
+
+# Tool agent (same JSON tool protocol as 3-agent_simple.py / 4-agent_memory.py)
+SYSTEM_MESSAGE = (
+    "You're a helpful personal assistant. Based on the user's message, "
+    "decide if you need to use a tool or respond directly.\n\n"
+    "If you need a tool, respond ONLY with a JSON object:\n"
+    "{ \"tool\": \"calculator\", \"input\": \"5 * (4 + 3)\" }\n"
+    "or\n"
+    "{ \"tool\": \"get_weather\", \"input\": \"New York\" }\n"
+    "or\n"
+    "{ \"tool\": \"get_date\", \"input\": \"\" }\n"
+    "or\n"
+    "{ \"tool\": \"get_time\", \"input\": \"\" }\n\n"
+    "If no tool is needed, respond naturally with a helpful message (NOT JSON)."
+)
+
+def parse_tool_call(content):
+    """Find a {"tool": ..., "input": ...} object in a response, if any"""
+    json_match = re.search(r'\{[^}]+\}', content)
+    if not json_match:
+        return None, None
+    try:
+        tool_call = json.loads(json_match.group())
+        return tool_call.get("tool"), tool_call.get("input")
+    except:
+        return None, None
+
+def run_tool_agent_turn(session, message, emit, cancel):
+    """One streamed turn of the tool agent (runs on the executor); stops early once cancel is set"""
+    messages = list(cache_aligned_window(session.history, recent_window)) + [
+        {"role": "user", "content": [{"text": message}]}
+    ]
+    result = stream_converse(
+        bedrock_runtime,
+        on_text=lambda text: emit({"type": "text", "text": text}),
+        on_tool=call_tool,
+        cancel=cancel,
+        modelId=model_id,
+        system=cached_system(SYSTEM_MESSAGE),
+        messages=with_history_cache_point(messages),
+        inferenceConfig={"maxTokens": 1024}
+    )
+    if result.tool_call:
+        tool_name, response = result.tool_call[0], result.tool_result
+    else:
+        tool_name, tool_input = parse_tool_call(result.text)
+        response = call_tool(tool_name, tool_input) if tool_name else result.text
+    if tool_name:
+        emit({"type": "tool", "name": tool_name, "result": response})
+
+    # The client was already told this turn failed: don't record it
+    if cancel.is_set():
+        raise StreamCancelled()
+    session.history.add_turn(message, response)
+    return {"ttft_s": result.ttft_s, "usage": result.usage}
+
+
+# LangChain agent (same tools and prompt as 6-agent_langchain-memory.py)
+checkpointer = InMemorySaver()
+langchain_agent = create_agent(
+    model=llm,
+    tools=[tool(calculate_expression), tool(get_weather), tool(get_date), tool(get_time)],
+    system_prompt="You are a helpful personal assistant. I can tell you the current date, time, and weather. I can also calculate mathematical expressions.",
+    middleware=[caching_middleware()],
+    checkpointer=checkpointer
+)
+
+def content_text(content):
+    """Text from a message chunk (a string, or Converse-style content blocks)"""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict) and block.get("type") == "text")
+
+async def run_langchain_turn(thread_id, message, send):
+    """One streamed turn of the create_agent graph; state lives in the checkpointer under thread_id"""
+    ttft_s = None
+    start = time.perf_counter()
+    async for chunk, metadata in langchain_agent.astream(
+        {"messages": [{"role": "user", "content": message}]},
+        {"configurable": {"thread_id": thread_id}},
+        stream_mode="messages"
+    ):
+        kind = type(chunk).__name__
+        if kind == "AIMessageChunk":
+            text = content_text(chunk.content)
+            if text:
+                if ttft_s is None:
+                    ttft_s = time.perf_counter() - start
+                await send({"type": "text", "text": text})
+        elif kind == "ToolMessage":
+            await send({"type": "tool", "name": chunk.name, "result": content_text(chunk.content)})
+    return {"ttft_s": ttft_s}
+
+
+# Sessions
+class Session:
+    __slots__ = ("history", "lock", "last_used")
+
+    def __init__(self):
+        self.history = MessageStore()  # tool agent messages
+        self.lock = asyncio.Lock()   # one turn at a time per thread_id
+        self.last_used = time.monotonic()
+
+sessions = {}
+
+def get_session(thread_id):
+    """Session for thread_id; drops threads idle for longer than session_ttl"""
+    now = time.monotonic()
+    for stale in [t for t, s in sessions.items() if now - s.last_used > session_ttl and not s.lock.locked()]:
+        del sessions[stale]
+        checkpointer.delete_thread(stale)
+    session = sessions.setdefault(thread_id, Session())
+    session.last_used = now
+    return session
+
+
+# Metrics
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.routes = {}
+
+    def route(self, name):
+        return self.routes.setdefault(name, {
+            "requests": 0, "errors": 0, "timeouts": 0, "in_flight": 0,
+            "latencies": deque(maxlen=1000), "ttfts": deque(maxlen=1000),
+        })
+
+    def snapshot(self):
+        def pct(values, q):
+            values = sorted(values)
+            return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "sessions": len(sessions),
+            "routes": {
+                name: {
+                    "requests": r["requests"], "errors": r["errors"], "timeouts": r["timeouts"],
+                    "in_flight": r["in_flight"],
+                    "latency_p50_s": pct(r["latencies"], 0.50), "latency_p95_s": pct(r["latencies"], 0.95),
+                    "ttft_p50_s": pct(r["ttfts"], 0.50), "ttft_p95_s": pct(r["ttfts"], 0.95),
+                }
+                for name, r in self.routes.items()
+            },
+        }
+
+metrics = Metrics()
+model_slots = None  # asyncio.Semaphore(max_concurrent), created inside the running loop
+
+
+# HTTP
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+async def send_json(writer, status, payload):
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+async def start_stream(writer):
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+        b"Transfer-Encoding: chunked\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+    )
+    await writer.drain()
+
+async def write_event(writer, event):
+    data = (json.dumps(event) + "\n").encode()
+    writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+    await writer.drain()
+
+async def end_stream(writer):
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+async def chat(agent, body, writer):
+    """POST /<agent>/chat {"thread_id": ..., "message": ...} -> NDJSON stream"""
+    try:
+        payload = json.loads(body or b"{}")
+        message = payload["message"]
+        thread_id = str(payload.get("thread_id") or uuid.uuid4().hex)
+    except (ValueError, KeyError, TypeError):
+        return await send_json(writer, 400, {"error": "expected JSON body with 'message' (and optional 'thread_id')"})
+
+    stats = metrics.route(agent)
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    session = get_session(thread_id)
+    send = lambda event: write_event(writer, event)
+    loop = asyncio.get_running_loop()
+    held = []            # session lock / model slot, released once the turn's work has really stopped
+    cancel = threading.Event()
+    worker_future = None
+    start = time.perf_counter()
+    await start_stream(writer)
+    try:
+        async with asyncio.timeout(request_timeout):
+            await session.lock.acquire()
+            held.append(session.lock)
+            await model_slots.acquire()
+            held.append(model_slots)
+            if agent == "tool-agent":
+                # Stream events from the executor thread back through a queue
+                queue = asyncio.Queue()
+                emit = lambda event: loop.call_soon_threadsafe(queue.put_nowait, event)
+
+                def worker():
+                    try:
+                        return run_tool_agent_turn(session, message, emit, cancel)
+                    finally:
+                        emit(None)
+
+                worker_future = executor.submit(worker)
+                while (event := await queue.get()) is not None:
+                    await send(event)
+                # shield: a timeout here must not mark the thread's future done while it still runs
+                info = await asyncio.shield(asyncio.wrap_future(worker_future))
+            else:
+                info = await run_langchain_turn(thread_id, message, send)
+        total_s = time.perf_counter() - start
+        stats["latencies"].append(total_s)
+        if info.get("ttft_s") is not None:
+            stats["ttfts"].append(info["ttft_s"])
+            info["ttft_s"] = round(info["ttft_s"], 3)
+        await send({"type": "done", "thread_id": thread_id, "total_s": round(total_s, 3), **info})
+    except TimeoutError:
+        stats["timeouts"] += 1
+        await send({"type": "error", "error": f"timed out after {request_timeout}s"})
+    except Exception as e:
+        stats["errors"] += 1
+        await send({"type": "error", "error": str(e)})
+    finally:
+        stats["in_flight"] -= 1
+        session.last_used = time.monotonic()
+        release = lambda: [primitive.release() for primitive in reversed(held)]
+        if worker_future is not None and not worker_future.done():
+            # Timed out mid-turn: stop the Bedrock stream, and keep this session's lock and the
+            # model slot until the thread has actually finished
+            cancel.set()
+            worker_future.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+        else:
+            release()
+    await end_stream(writer)
+
+async def handle_connection(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 10)
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while (line := await asyncio.wait_for(reader.readline(), 10)) not in (b"\r\n", b"\n", b""):
+            key, value = line.decode("latin-1").split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > max_body:
+            return await send_json(writer, 413, {"error": "request body too large"})
+        body = await reader.readexactly(length) if length else b""
+        path = path.split("?", 1)[0]
+
+        if path == "/health":
+            await send_json(writer, 200, {"status": "ok"})
+        elif path == "/metrics":
+            await send_json(writer, 200, metrics.snapshot())
+        elif path in ("/tool-agent/chat", "/langchain-agent/chat"):
+            if method != "POST":
+                return await send_json(writer, 405, {"error": "use POST"})
+            await chat(path.split("/")[1], body, writer)
+        else:
+            await send_json(writer, 404, {"error": f"no route for {path}"})
+    except (ValueError, TimeoutError, asyncio.IncompleteReadError):
+        await send_json(writer, 400, {"error": "malformed request"})
+    except ConnectionError:
+        pass  # client went away mid-stream
+    finally:
+        writer.close()
+
+async def main(host=host, port=port):
+    global model_slots
+    model_slots = asyncio.Semaphore(max_concurrent)
+    server = await asyncio.start_server(handle_connection, host, port)
+    print(f"🤖 Agent server on http://{host}:{port} (tool-agent, langchain-agent, /health, /metrics)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    if "--port" in sys.argv:
+        port = int(sys.argv[sys.argv.index("--port") + 1])
+    asyncio.run(main(host, port))
@@ -2,9 +2,12 @@ import streamlit as st
 from google import genai
 from google.genai import types
 from PIL import Image
-import time
 import os
+import uuid
 from dotenv import load_dotenv
+import model_catalog
+import query_router
+from generation_worker import GenerationPool, PoolFull, generate_with_fallback
 
 # Load environment variables
 load_dotenv()
@@ -75,7 +78,10 @@ Guidelines:
     
     with st.expander("Advanced"):
         temperature = st.slider("Temperature", 0.0, 2.0, 0.4, 0.1) # Lowered to 0.4 for accuracy
-        max_tokens = st.slider("Max Tokens", 100, 8192, 8192, 100)
+        max_tokens = st.slider("Max Tokens", 100, 8192, 8192, 100, help="Upper limit; the response mode may use less.")
+        # Auto: a local classifier picks the model tier and output budget per question
+        mode_labels = {"Auto": None} | {c["label"]: name for name, c in query_router.QUERY_CLASSES.items()}
+        response_mode = mode_labels[st.selectbox("Response Mode", list(mode_labels))]
 
     st.divider()
     
@@ -83,6 +89,10 @@ Guidelines:
     
     if st.button("🗑️ Clear Chat"):
         st.session_state.messages = []
+        # Stop any generation still running for this session
+        if st.session_state.get("pending_job"):
+            st.session_state.pending_job.cancel()
+            st.session_state.pending_job = None
         st.rerun()
 
 @st.cache_resource
@@ -110,6 +120,20 @@ client = get_client()
 if not client:
     st.error("❌ GEMINI_API_KEY not found.")
     st.stop()
+
+@st.cache_data(ttl=model_catalog.catalog_ttl)
+def get_catalog(_client):
+    # Disk-cached listing + probe results (refresh with: python list_models.py --refresh --probe)
+    return model_catalog.load_catalog(_client)
+
+catalog = get_catalog(client)
+
+@st.cache_resource
+def get_pool():
+    # One bounded worker pool shared by all sessions (see generation_worker.py)
+    return GenerationPool()
+
+pool = get_pool()
     
 # Test validity immediately
 try:
@@ -121,12 +145,59 @@ except Exception as e:
 # Initialize Chat History
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # Display Chat History
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
+# Notes for the generation that just finished (shown once)
+last_job = st.session_state.pop("last_job", None)
+if last_job and last_job.error != "Cancelled":
+    if not last_job.model:
+        st.error(f"⚠️ {last_job.error}")
+        with st.expander("🔍 Debug: Why did they fail?"):
+            for err in last_job.error_stats:
+                st.write(err)
+    elif not last_job.text and "MAX_TOKENS" in str(last_job.finish_reason):
+        # The output budget ran out (on thinking models, possibly while thinking)
+        st.warning("⚠️ The answer hit the output token limit before any text was written. "
+                   "Try a larger Response Mode or raise Max Tokens.")
+    elif not last_job.text:
+        # Often happens if response is blocked by safety filters
+        st.warning("⚠️ The model refused to answer (Safety Filter Triggered).")
+        st.write(f"Debug details: {last_job.finish_reason}")
+    else:
+        # Debug Info: Why did it stop?
+        # finish_reason might be an Enum or Int depending on version, convert to str to be safe
+        finish_reason = last_job.finish_reason
+        if finish_reason is not None and str(finish_reason) != "FinishReason.STOP" and str(finish_reason) != "1":
+            st.warning(f"⚠️ Response stopped due to: {finish_reason}")
+        
+        # Usage Metadata (Optional)
+        usage = last_job.usage
+        if usage:
+            st.caption(f"Tokens: {usage.prompt_token_count} query + {usage.candidates_token_count} response")
+        
+        # Routing: chosen tier/budget, tokens used and a probe-based estimate vs. the default tier
+        route = last_job.route
+        if route:
+            savings = query_router.estimate_savings(
+                route,
+                last_job.model,
+                last_job.finished_at - last_job.started_at,
+                usage,
+                catalog
+            )
+            st.caption(f"{query_router.format_savings(route, savings)} · {last_job.model}")
+
+        # Time spent waiting for a free worker (not part of the model latency above)
+        queue_wait = last_job.started_at - last_job.submitted_at
+        if queue_wait >= 0.1:
+            st.caption(f"⏳ Queued {queue_wait:.1f}s for a free worker")
+
 # File Uploader (Chat Integration)
 with st.popover("📎 Attach"):
     uploaded_file = st.file_uploader(
@@ -205,134 +276,92 @@ if prompt := (st.chat_input("What is up?") or suggested_prompt):
 
     # Generate Response
     try:
-        with st.chat_message("assistant"):
-            # Use a more stable model to avoid Rate Limits
-            # Fallback Strategy for Rate Limits
-            fallback_models = [
-                "gemini-2.5-flash",                  # Newest, likely good quota
-                "gemini-2.0-flash",                  # Stable workhorse
-                "gemini-2.0-flash-lite-preview-02-05", # Fast/Lite
-                "gemini-1.5-flash",                  # Reliable previous generation
-                "gemini-2.0-flash-001",              # Older stable 2.0
-                "gemini-flash-latest",               # Alias for latest flash
-                "gemini-1.5-pro-latest"              # Heavy duty fallback
-            ]
-            
-            # Prepare Content (Restored)
-            generation_content = [prompt]
-            if uploaded_file:
-                # Reset file pointer
-                uploaded_file.seek(0)
-                if uploaded_file.type in ["image/png", "image/jpeg", "image/jpg"]:
-                    img = Image.open(uploaded_file)
-                    generation_content.append(img)
-                elif uploaded_file.type == "application/pdf":
-                    generation_content.append(types.Part.from_bytes(
-                        data=uploaded_file.getvalue(),
-                        mime_type="application/pdf"
-                    ))
-            
-            # Load Knowledge Base (Billboards) (Restored)
-            try:
-                with open("billboards.csv", "r") as f:
-                    kb_data = f.read()
-                full_system_prompt = f"{system_prompt}\n\nKnowledge Base (Billboards):\n{kb_data}"
-                st.toast(f"✅ Knowledge Base Loaded ({len(kb_data)} chars)", icon="📚") 
-                # st.write(f"Debug: Loaded {len(kb_data)} chars of billboard data.")
-            except Exception as e:
-                # Fallback if file missing
-                full_system_prompt = system_prompt
-                st.error(f"⚠️ Failed to load Knowledge Base: {e}")
-            
-            response = None
-            successful_model = None
-            error_stats = []
-            
-            for model_id in fallback_models:
-                retry_count = 0
-                max_retries = 2
-                
-                # Check for uploaded file compatibility (some models might not support PDF/Images well, but these Flash ones do)
-                
-                try:
-                     while retry_count < max_retries:
-                        try:
-                            # Placeholder for status update
-                            status_msg = f"Generating with {model_id}..." if retry_count == 0 else f"Retrying with {model_id} (Attempt {retry_count+1})..."
-                            placeholder = st.empty()
-                            # placeholder.info(status_msg) 
-
-                            response = client.models.generate_content(
-                                model=model_id,
-                                contents=generation_content,
-                                config=types.GenerateContentConfig(
-                                    system_instruction=full_system_prompt,
-                                    temperature=temperature,
-                                    max_output_tokens=max_tokens
-                                )
-                            )
-                            successful_model = model_id
-                            placeholder.empty()
-                            break # Success! Break retry loop
-                        
-                        except Exception as e:
-                            error_str = str(e)
-                            # Handle Rate Limits
-                            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower():
-                                retry_count += 1
-                                if retry_count == max_retries:
-                                    # This model failed completely, let's try the next one in the list
-                                    placeholder.warning(f"⚠️ {model_id} is busy. Switching model...")
-                                    time.sleep(2) # Increased from 1s to 2s to let quota cool down
-                                    placeholder.empty()
-                                    raise e # Trigger outer loop to continue to next model
-                                else:
-                                    wait_time = retry_count * 5 # Short wait before retry same model
-                                    time.sleep(wait_time)
-                            else:
-                                raise e # Fatal error (not rate limit), stop everything
-                    
-                     if response:
-                        break # Success! Break model loop
-                        
-                except Exception as e:
-                    # Capture the error to debug why this model failed
-                    error_stats.append(f"{model_id}: {str(e)}")
-                    continue # Try next model
-            
-            if not response:
-                st.error("⚠️ All available models are currently overloaded (or incompatible).")
-                with st.expander("🔍 Debug: Why did they fail?"):
-                    for err in error_stats:
-                        st.write(err)
-            else:
-                try:
-                    response_text = response.text
-                    st.markdown(response_text)
-                    # Add assistant message to state
-                    st.session_state.messages.append({"role": "assistant", "content": response_text})
-                    
-                    # Debug Info: Why did it stop?
-                    if response.candidates:
-                         finish_reason = response.candidates[0].finish_reason
-                         # Check if it finished naturally (STOP)
-                         # finish_reason might be an Enum or Int depending on version, convert to str to be safe
-                         if str(finish_reason) != "FinishReason.STOP" and str(finish_reason) != "1":
-                             st.warning(f"⚠️ Response stopped due to: {finish_reason}")
-                         
-                         # Usage Metadata (Optional)
-                         try:
-                             usage = response.usage_metadata
-                             st.caption(f"Tokens: {usage.prompt_token_count} query + {usage.candidates_token_count} response")
-                         except:
-                             pass
-                except Exception as e:
-                    # Often happens if response is blocked by safety filters
-                    st.warning("⚠️ The model refused to answer (Safety Filter Triggered).")
-                    try:
-                        st.write(f"Debug details: {response.candidates[0].finish_reason if response.candidates else 'No candidates'}")
-                    except:
-                        pass
+        # Fallback Strategy for Rate Limits:
+        # available models that accept the attachment, fastest measured first
+        fallback_models = model_catalog.fallback_order(
+            catalog,
+            attachment_mime=uploaded_file.type if uploaded_file else None
+        )
+        
+        # Pick model tier and output budget for this question (or the user's override)
+        route = query_router.route(
+            prompt,
+            fallback_models,
+            has_attachment=uploaded_file is not None,
+            override=response_mode,
+            max_tokens_cap=max_tokens
+        )
+        
+        # Prepare Content (Restored)
+        generation_content = [prompt]
+        if uploaded_file:
+            # Reset file pointer
+            uploaded_file.seek(0)
+            if uploaded_file.type in ["image/png", "image/jpeg", "image/jpg"]:
+                img = Image.open(uploaded_file)
+                generation_content.append(img)
+            elif uploaded_file.type == "application/pdf":
+                generation_content.append(types.Part.from_bytes(
+                    data=uploaded_file.getvalue(),
+                    mime_type="application/pdf"
+                ))
+        
+        # Load Knowledge Base (Billboards) (Restored)
+        try:
+            with open("billboards.csv", "r") as f:
+                kb_data = f.read()
+            full_system_prompt = f"{system_prompt}\n\nKnowledge Base (Billboards):\n{kb_data}"
+            st.toast(f"✅ Knowledge Base Loaded ({len(kb_data)} chars)", icon="📚") 
+            # st.write(f"Debug: Loaded {len(kb_data)} chars of billboard data.")
+        except Exception as e:
+            # Fallback if file missing
+            full_system_prompt = system_prompt
+            st.error(f"⚠️ Failed to load Knowledge Base: {e}")
+        
+        # Thinking tokens count against max_output_tokens, so each model gets the route's thinking budget
+        generation_config = types.GenerateContentConfig(
+            system_instruction=full_system_prompt,
+            temperature=temperature,
+            max_output_tokens=route["max_output_tokens"]
+        )
+        
+        # Submit to the shared worker pool so this script thread doesn't block on the model
+        try:
+            st.session_state.pending_job = pool.submit(
+                st.session_state.session_id,
+                generate_with_fallback,
+                client,
+                route["models"],
+                generation_content,
+                lambda model_id: query_router.model_config(route, model_id, generation_config),
+                route=route
+            )
+        except PoolFull:
+            load = pool.stats()
+            st.error(f"⚠️ The assistant is busy right now ({load['pending']} of {load['max_pending']} slots taken, "
+                     f"{load['workers']} workers). Try again shortly.")
 
     except Exception as e:
         st.error(f"Error: {e}")
+
+# Pending Response: polled from the worker pool (only ticks while a job is running)
+@st.fragment(run_every=0.5 if st.session_state.get("pending_job") else None)
+def show_pending_response():
+    job = st.session_state.get("pending_job")
+    if job is None:
+        return
+    job.touch()  # heartbeat: jobs nobody polls (session closed) are cancelled
+    if not job.done():
+        with st.chat_message("assistant"):
+            st.caption(job.status)
+            if job.text:
+                st.markdown(job.text)
+        return
+    st.session_state.pending_job = None
+    st.session_state.last_job = job
+    if job.model and job.text:
+        # Add assistant message to state
+        st.session_state.messages.append({"role": "assistant", "content": job.text})
+    st.rerun()
+
+show_pending_response()
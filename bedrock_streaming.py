@@ -0,0 +1,178 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Tools are started on a worker thread so the rest of the stream keeps draining
+tool_executor = ThreadPoolExecutor(max_workers=4)
+
+JSON_FENCE = "```json"
+
+
+class StreamCancelled(Exception):
+    """Raised by stream_converse when its cancel event is set mid-stream"""
+
+
+class ToolCallDetector:
+    """Watches streamed text for the agents' JSON tool request ({"tool": ..., "input": ...})"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.mode = None        # None = undecided, "text" = prose, "json" = looks like a tool request
+        self.tool_call = None   # (tool, input) once the JSON object is complete
+        self.start = None       # index of the opening brace
+        self.scan_pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, delta):
+        """Add a text delta; returns the part that is safe to display as prose"""
+        self.buffer += delta
+        if self.mode is None:
+            head = self.buffer.lstrip()
+            if not head:
+                return ""
+            # Tool requests start with '{' or a ```json fence; anything else is prose
+            fence = head[:len(JSON_FENCE)].lower()
+            if head[0] == "{" or fence == JSON_FENCE:
+                self.mode = "json"
+            elif JSON_FENCE.startswith(fence):
+                return ""  # could still become ```json; wait for more text
+            else:
+                self.mode = "text"
+                return self.buffer
+        if self.mode == "text":
+            return delta
+        if self.tool_call is None:
+            self._scan()
+        return ""
+
+    def _scan(self):
+        """Incrementally match braces (string-aware) until the first object closes"""
+        buffer = self.buffer
+        for i in range(self.scan_pos, len(buffer)):
+            ch = buffer[i]
+            if self.start is None:
+                if ch == "{":
+                    self.start, self.depth = i, 1
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.scan_pos = len(buffer)
+                    self._parse(buffer[self.start:i + 1])
+                    return
+        self.scan_pos = len(buffer)
+
+    def _parse(self, candidate):
+        try:
+            call = json.loads(candidate)
+        except ValueError:
+            return
+        if isinstance(call, dict) and call.get("tool"):
+            self.tool_call = (call.get("tool"), call.get("input"))
+
+
+class StreamPrinter:
+    """Prints text deltas as they arrive and remembers what was shown this turn"""
+
+    def __init__(self, prefix="Agent: "):
+        self.prefix = prefix
+        self.shown = ""
+
+    def reset(self):
+        self.shown = ""
+
+    def __call__(self, text):
+        if not text:
+            return
+        if not self.shown:
+            print(self.prefix, end="", flush=True)
+        print(text, end="", flush=True)
+        self.shown += text
+
+    def finish(self):
+        if self.shown:
+            print()
+
+    def showed(self, response):
+        """True if the response was already displayed by streaming"""
+        return bool(self.shown) and self.shown.strip() == str(response).strip()
+
+
+class StreamResult:
+    def __init__(self):
+        self.text = ""
+        self.ttft_s = None
+        self.total_s = None
+        self.tool_call = None
+        self.tool_result = None
+        self.tool_started_s = None
+        self.usage = {}
+
+    def timing_report(self):
+        """One-line per-turn latency summary"""
+        parts = [f"TTFT {self.ttft_s:.2f}s" if self.ttft_s is not None else "TTFT n/a",
+                 f"end-to-end {self.total_s:.2f}s"]
+        if self.tool_started_s is not None:
+            parts.append(f"tool started at {self.tool_started_s:.2f}s")
+        return "⏱️ " + " | ".join(parts)
+
+
+def stream_converse(client, on_text=None, on_tool=None, cancel=None, **request):
+    """Call converse_stream, showing prose live and starting a tool as soon as its JSON is complete.
+
+    cancel: optional threading.Event; once set, the stream is closed and StreamCancelled is raised.
+    """
+    result = StreamResult()
+    detector = ToolCallDetector()
+    future = None
+    start = time.perf_counter()
+
+    response = client.converse_stream(**request)
+    for event in response["stream"]:
+        if cancel is not None and cancel.is_set():
+            close = getattr(response["stream"], "close", None)
+            if close:
+                close()
+            raise StreamCancelled()
+        if "contentBlockDelta" in event:
+            delta = event["contentBlockDelta"]["delta"].get("text", "")
+            if not delta:
+                continue
+            if result.ttft_s is None:
+                result.ttft_s = time.perf_counter() - start
+            result.text += delta
+            visible = detector.feed(delta)
+            if on_text and visible:
+                on_text(visible)
+            # Early dispatch: don't wait for messageStop once name and input are known
+            if detector.tool_call and future is None and on_tool:
+                result.tool_call = detector.tool_call
+                result.tool_started_s = time.perf_counter() - start
+                future = tool_executor.submit(on_tool, *detector.tool_call)
+        elif "metadata" in event:
+            result.usage = event["metadata"].get("usage", {})
+
+    # Undecided/failed JSON candidates were held back; show them now as prose
+    if on_text and detector.mode != "text" and detector.tool_call is None:
+        on_text(detector.buffer)
+    if future is not None:
+        try:
+            result.tool_result = future.result()
+        except Exception as e:
+            # A failing tool is the tool's answer, not a Bedrock error
+            result.tool_result = f"Error running {result.tool_call[0]}: {e}"
+    result.total_s = time.perf_counter() - start
+    return result
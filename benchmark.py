@@ -0,0 +1,424 @@
+import argparse
+import atexit
+import builtins
+import contextvars
+import json
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Usage: python benchmark.py [--flows loop,tool_agent] [--concurrency 1,4,16] [--history 0,20]
+#                            [--ttft 0.2] [--token-rate 200] [--rate-limit 0.05]
+#                            [--save results.json] [--baseline baseline.json]
+# Drives each agent flow against the stub models in stub_models.py (no AWS/Gemini calls).
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Stub runs must not touch the real caches
+_scratch = tempfile.mkdtemp(prefix="agent-bench-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ.setdefault("GEMINI_API_KEY", "stub-key")
+os.environ["MODEL_CATALOG_FILE"] = os.path.join(_scratch, "model_catalog.json")
+os.environ["AGENT_MEMORY_DIR"] = os.path.join(_scratch, "memory")
+sys.path.insert(0, ROOT)
+
+import stub_models
+
+QUERIES = [
+    "what's the weather in Paris?",
+    "tell me something about billboard pricing",
+    "calculate 5 * (4 + 3)",
+    "suggest a slogan for a coffee shop",
+]
+
+
+# Session driving for the interactive scripts
+class ScriptSession:
+    """Feeds input() for one script run and times each turn (input returned -> next input asked)"""
+
+    def __init__(self, queries, warmup_turns):
+        self.inputs = list(queries)
+        self.warmup_turns = warmup_turns
+        self.turn = 0
+        self.turn_started = None
+        self.latencies = []
+
+    def next_input(self):
+        now = time.perf_counter()
+        if self.turn_started is not None and self.turn > self.warmup_turns:
+            self.latencies.append(now - self.turn_started)
+        self.turn += 1
+        # Warm-up turns only build history, so they skip the simulated latency
+        stub_models.fast_mode.set(self.turn <= self.warmup_turns)
+        self.turn_started = time.perf_counter()
+        return self.inputs.pop(0) if self.inputs else "quit"
+
+    def finish(self):
+        """For scripts that end without asking again (1-llm_call.py)"""
+        if self.turn_started is not None and self.turn > self.warmup_turns and self.inputs == []:
+            self.latencies.append(time.perf_counter() - self.turn_started)
+
+
+current_session = contextvars.ContextVar("current_session")
+
+
+def scripted_input(prompt=""):
+    return current_session.get().next_input()
+
+
+def patch_clients():
+    """Point boto3, google-genai and ChatBedrock at the stubs (flows needing a missing package report it as an error)"""
+    try:
+        import boto3
+        boto3.client = lambda *args, **kwargs: stub_models.StubBedrock()
+    except ImportError:
+        pass
+    try:
+        from google import genai
+        genai.Client = stub_models.StubGenaiClient
+    except ImportError:
+        pass
+    try:
+        import langchain_aws
+        langchain_aws.ChatBedrock = lambda **kwargs: stub_models.stub_chat_model()
+    except ImportError:
+        pass
+    import long_term_memory
+    # Each benchmark session gets its own on-disk memory directory
+    real_memory = long_term_memory.LongTermMemory
+    long_term_memory.LongTermMemory = lambda *args, **kwargs: real_memory(tempfile.mkdtemp(dir=_scratch))
+
+
+def script_flow(filename, single_turn=False):
+    def run(n_turns, history):
+        warmup = 0 if single_turn else history
+        queries = [QUERIES[i % len(QUERIES)] for i in range(warmup + (1 if single_turn else n_turns))]
+        session = ScriptSession(queries, warmup)
+        current_session.set(session)
+        runpy.run_path(os.path.join(ROOT, filename), run_name="__main__")
+        if single_turn:
+            session.finish()
+        return session.latencies
+    return run
+
+
+# Supervisor / swarm (built like the cells in 7-agent_architecture.ipynb)
+def add(a: float, b: float) -> float:
+    """Add two numbers."""
+    return a + b
+
+def multiply(a: float, b: float) -> float:
+    """Multiply two numbers."""
+    return a * b
+
+def divide(a: float, b: float) -> float:
+    """Divide two numbers."""
+    return a / b
+
+MATH_QUERY = "what's (34531235 + 73453412312) * 31231335345 / 2353413123?"
+
+
+def build_supervisor():
+    from langchain.agents import create_agent
+    from langgraph_supervisor import create_supervisor
+    model = stub_models.stub_chat_model()
+    agents = [
+        create_agent(model=model, tools=[add], name="add_agent", system_prompt="You are an addition expert."),
+        create_agent(model=model, tools=[multiply], name="multiply_agent", system_prompt="You are a multiplication expert."),
+        create_agent(model=model, tools=[divide], name="divide_agent", system_prompt="You are a division expert."),
+    ]
+    return create_supervisor(agents, model=model, prompt="You are a team supervisor managing math experts.").compile()
+
+
+def build_swarm():
+    from langchain.agents import create_agent
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph_swarm import create_swarm, create_handoff_tool
+    model = stub_models.stub_chat_model()
+    specs = {"add_agent": add, "multiply_agent": multiply, "divide_agent": divide}
+    agents = [
+        create_agent(
+            model=model,
+            tools=[fn] + [create_handoff_tool(agent_name=other) for other in specs if other != name],
+            name=name,
+            system_prompt=f"You are the {name}."
+        )
+        for name, fn in specs.items()
+    ]
+    return create_swarm(agents, default_active_agent="add_agent").compile(checkpointer=InMemorySaver())
+
+
+def graph_flow(build):
+    graphs = {}
+
+    def run(n_turns, history):
+        # One compiled graph shared by all sessions of a scenario, like a server would
+        app = graphs.get("app") or graphs.setdefault("app", build())
+        thread_id = f"bench-{threading.get_ident()}-{time.perf_counter_ns()}"
+        latencies = []
+        for _ in range(n_turns):
+            start = time.perf_counter()
+            app.invoke({"messages": [{"role": "user", "content": MATH_QUERY}]},
+                       {"configurable": {"thread_id": thread_id}})
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    return run
+
+
+# Streamlit app through AppTest
+def app_flow(n_turns, sessions):
+    """Drive `sessions` app sessions from this one thread; their jobs overlap in the app's shared pool.
+
+    AppTest can't run scripts from several threads at once, so script runs are interleaved
+    while the generations (what the pool runs concurrently in production) overlap.
+    """
+    from streamlit.testing.v1 import AppTest
+    apps = [AppTest.from_file(os.path.join(ROOT, "app_ui.py"), default_timeout=120) for _ in range(sessions)]
+    for at in apps:
+        at.run()
+    latencies = []
+    for i in range(n_turns):
+        turns = []  # (app, submitted at, job)
+        for at in apps:
+            start = time.perf_counter()
+            at.chat_input[0].set_value(QUERIES[i % len(QUERIES)]).run()
+            if "pending_job" not in at.session_state or at.session_state["pending_job"] is None:
+                continue  # rejected by the worker pool (backpressure)
+            turns.append((at, start, at.session_state["pending_job"]))
+        while not all(job.done() for _, _, job in turns):
+            for _, _, job in turns:
+                job.touch()
+            time.sleep(0.01)
+        for at, start, job in turns:
+            render = time.perf_counter()
+            at.run()  # the polling fragment picks up the finished job
+            latencies.append(job.finished_at - start + time.perf_counter() - render)
+    return latencies
+
+
+FLOWS = {
+    # name: (runner, supports history)
+    "single_call": (script_flow("1-llm_call.py", single_turn=True), False),
+    "loop": (script_flow("2-llm_loop.py"), False),
+    "tool_agent": (script_flow("3-agent_simple.py"), False),
+    "memory_agent": (script_flow("4-agent_memory.py"), True),
+    "langchain_agent": (script_flow("5-agent_langchain.py"), False),
+    "langchain_memory_agent": (script_flow("6-agent_langchain-memory.py"), True),
+    "supervisor": (graph_flow(build_supervisor), False),
+    "swarm": (graph_flow(build_swarm), False),
+    # app_ui.py sends only the new prompt, so prior chat history doesn't change the request
+    "app": (app_flow, False),
+}
+
+
+# Memory
+def current_rss_mb():
+    """Resident set size now (Linux /proc; None elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+class RssSampler:
+    """Samples RSS on a background thread: per-scenario peak, unlike ru_maxrss (process lifetime)"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.start_mb = current_rss_mb()
+        self.peak_mb = self.start_mb
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss_mb()
+            if rss is not None and rss > self.peak_mb:
+                self.peak_mb = rss
+
+    def __enter__(self):
+        if self.start_mb is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.end_mb = current_rss_mb()
+        return False
+
+    def report(self):
+        if self.start_mb is None:
+            return {"rss_delta_mb": None, "rss_peak_delta_mb": None}
+        return {
+            "rss_delta_mb": round(self.end_mb - self.start_mb, 1),                       # retained after the run
+            "rss_peak_delta_mb": round(max(self.peak_mb, self.end_mb) - self.start_mb, 1),  # high-water mark during it
+        }
+
+
+# Scenario
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def run_scenario(flow, concurrency, history, n_turns, trace_memory=False):
+    """Run `concurrency` sessions of a flow at once and summarise them"""
+    runner, _ = FLOWS[flow]
+    stub_models.stats = stub_models.StubStats()
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    if flow == "app":
+        # AppTest can't run from several threads at once: one thread drives every session
+        runs = [lambda: app_flow(n_turns, concurrency)]
+    else:
+        runs = [lambda: runner(n_turns, history)] * concurrency
+
+    def session(run):
+        try:
+            result = run()
+            with lock:
+                latencies.extend(result)
+        except BaseException as e:  # scripts may call exit()
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    if trace_memory:
+        tracemalloc.start()
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        # Threads start with an empty context, so each session sets its own stub/session state
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(session, run)) for run in runs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+    peak_py_mb = None
+    if trace_memory:
+        peak_py_mb = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+
+    stats = stub_models.stats
+    requests = len(latencies)
+    return {
+        "flow": flow,
+        "concurrency": concurrency,
+        "history": history,
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 3) if wall else None,
+        "p50_s": round(percentile(latencies, 0.50), 4) if latencies else None,
+        "p99_s": round(percentile(latencies, 0.99), 4) if latencies else None,
+        "llm_calls": stats.calls,
+        "rate_limited": stats.rate_limited,
+        "prompt_chars_per_call": round(stats.prompt_chars / stats.calls) if stats.calls else 0,
+        **rss.report(),
+        "peak_py_mb": peak_py_mb,
+    }
+
+
+# Baseline comparison
+def scenario_key(result):
+    return f"{result['flow']}|c={result['concurrency']}|h={result['history']}"
+
+
+def compare(results, baseline, threshold):
+    """Print % change vs. the baseline; returns the list of regressions"""
+    previous = {scenario_key(r): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'scenario':<36}{'rps':>10}{'p50':>10}{'p99':>10}{'prompt':>10}")
+    for result in results:
+        old = previous.get(scenario_key(result))
+        if not old:
+            print(f"{scenario_key(result):<36}{'(new)':>10}")
+            continue
+        changes = {}
+        for metric in ("throughput_rps", "p50_s", "p99_s", "prompt_chars_per_call"):
+            if old.get(metric) and result.get(metric) is not None:
+                changes[metric] = (result[metric] - old[metric]) / old[metric]
+        fmt = lambda m: f"{changes[m]:+.0%}" if m in changes else "-"
+        print(f"{scenario_key(result):<36}{fmt('throughput_rps'):>10}{fmt('p50_s'):>10}"
+              f"{fmt('p99_s'):>10}{fmt('prompt_chars_per_call'):>10}")
+        if changes.get("throughput_rps", 0) < -threshold or any(
+            changes.get(m, 0) > threshold for m in ("p50_s", "p99_s", "prompt_chars_per_call")
+        ):
+            regressions.append(scenario_key(result))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agents and app against stub models")
+    parser.add_argument("--flows", default=",".join(FLOWS))
+    parser.add_argument("--concurrency", default="1,4")
+    parser.add_argument("--history", default="0,20", help="turns of prior conversation")
+    parser.add_argument("--turns", type=int, default=5, help="measured turns per session")
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--token-rate", type=float, default=200.0)
+    parser.add_argument("--output-tokens", type=int, default=40)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of a 429 per call")
+    parser.add_argument("--stream", action="store_true", help="run the scripts with --stream (read from sys.argv)")
+    parser.add_argument("--trace-memory", action="store_true", help="track Python heap peak (slower)")
+    parser.add_argument("--save", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare with a saved results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (fraction)")
+    args = parser.parse_args()
+
+    stub_models.settings = stub_models.StubConfig(args.ttft, args.token_rate, args.output_tokens, args.rate_limit)
+    os.chdir(ROOT)  # app_ui.py reads billboards.csv relative to the working directory
+    patch_clients()
+    builtins.input = scripted_input
+
+    results = []
+    real_stdout = sys.stdout
+    for flow in args.flows.split(","):
+        histories = [int(h) for h in args.history.split(",")] if FLOWS[flow][1] else [0]
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            for history in histories:
+                sys.stdout = open(os.devnull, "w")  # the scripts are chatty
+                try:
+                    result = run_scenario(flow, concurrency, history, args.turns, args.trace_memory)
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = real_stdout
+                results.append(result)
+                print(f"📈 {scenario_key(result):<36} {result['throughput_rps']} req/s  "
+                      f"p50 {result['p50_s']}s  p99 {result['p99_s']}s  "
+                      f"prompt {result['prompt_chars_per_call']} chars/call  "
+                      f"RSS +{result['rss_peak_delta_mb']} MB peak  "
+                      f"errors {result['errors']}" + (f" ({result['first_error']})" if result["errors"] else ""))
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "stub": {"ttft": args.ttft, "token_rate": args.token_rate,
+                 "output_tokens": args.output_tokens, "rate_limit": args.rate_limit},
+        "turns": args.turns,
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions (> {args.threshold:.0%}): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
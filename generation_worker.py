@@ -0,0 +1,249 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Set Parameters
+max_workers = int(os.getenv("GENERATION_WORKERS", "8"))
+max_pending = int(os.getenv("GENERATION_MAX_PENDING", "32"))  # queued + running jobs
+abandon_after = 15.0  # seconds without a poll before a job counts as abandoned
+max_retries = 2
+
+
+class PoolFull(Exception):
+    """Raised by submit() when the pool is at capacity (backpressure)"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it was cancelled or its session went away"""
+
+
+def is_rate_limit(error):
+    error_str = str(error)
+    return "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "quota" in error_str.lower()
+
+
+# Job
+class GenerationJob:
+    """One generation request; the worker writes progress, the session polls it"""
+
+    def __init__(self, session_id, route=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.route = route  # query_router.route() result the job was submitted with, if any
+        self.status = "Queued..."
+        self.text = ""
+        self.model = None
+        self.finish_reason = None
+        self.usage = None
+        self.error = None
+        self.error_stats = []
+        self.submitted_at = time.perf_counter()  # started_at - submitted_at = time queued for a worker
+        self.started_at = None
+        self.finished_at = None
+        self.last_polled = time.monotonic()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    def touch(self):
+        """Called by the session on every poll; jobs nobody polls get cancelled"""
+        self.last_polled = time.monotonic()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set() or time.monotonic() - self.last_polled > abandon_after
+
+    def done(self):
+        return self._done.is_set()
+
+    def check(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+    def wait(self, seconds):
+        """Interruptible replacement for time.sleep in retry back-off"""
+        if self._cancel.wait(seconds):
+            raise JobCancelled()
+        self.check()
+
+
+# Generation with model fallback (runs on a worker thread)
+def generate_with_fallback(job, client, models, contents, config):
+    """Stream from the first model that answers; retry rate limits, then fall back.
+
+    config is a GenerateContentConfig, or a function model_id -> config for per-model settings.
+    """
+    for model_id in models:
+        model_config = config(model_id) if callable(config) else config
+        retry_count = 0
+        while retry_count < max_retries:
+            job.check()
+            job.status = f"Generating with {model_id}..." if retry_count == 0 else \
+                f"Retrying with {model_id} (Attempt {retry_count+1})..."
+            try:
+                job.text = ""
+                for chunk in client.models.generate_content_stream(
+                    model=model_id,
+                    contents=contents,
+                    config=model_config
+                ):
+                    job.check()
+                    if chunk.text:
+                        job.text += chunk.text
+                    if chunk.candidates and chunk.candidates[0].finish_reason:
+                        job.finish_reason = chunk.candidates[0].finish_reason
+                    if chunk.usage_metadata:
+                        job.usage = chunk.usage_metadata
+                job.model = model_id
+                return
+            except JobCancelled:
+                raise
+            except Exception as e:
+                if not is_rate_limit(e):
+                    # Fatal for this model: try the next one
+                    job.error_stats.append(f"{model_id}: {str(e)}")
+                    break
+                retry_count += 1
+                if retry_count == max_retries:
+                    job.status = f"⚠️ {model_id} is busy. Switching model..."
+                    job.error_stats.append(f"{model_id}: {str(e)}")
+                    job.wait(2)  # let quota cool down
+                else:
+                    job.wait(retry_count * 5)  # short wait before retrying the same model
+    job.error = "All available models are currently overloaded (or incompatible)."
+
+
+# Pool
+class GenerationPool:
+    """Shared, bounded worker pool; one active job per session"""
+
+    def __init__(self, max_workers=max_workers, max_pending=max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.active = {}  # session_id -> job
+
+    def submit(self, session_id, fn, *args, route=None):
+        """Queue fn(job, *args); raises PoolFull at capacity, else cancels the session's previous job"""
+        with self.lock:
+            # Check capacity first: a rejected submit must not cost the user the answer in progress
+            if self.pending >= self.max_pending:
+                raise PoolFull(f"{self.pending} generations in progress, try again shortly.")
+            previous = self.active.get(session_id)
+            if previous is not None:
+                previous.cancel()
+            self.pending += 1
+            job = GenerationJob(session_id, route)
+            self.active[session_id] = job
+        self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        try:
+            job.check()  # may have been cancelled while queued
+            job.started_at = time.perf_counter()
+            fn(job, *args)
+        except JobCancelled:
+            job.status = "Cancelled"
+            job.error = "Cancelled"
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.finished_at = time.perf_counter()
+            with self.lock:
+                self.pending -= 1
+                if self.active.get(job.session_id) is job:
+                    del self.active[job.session_id]
+            job._done.set()
+
+    def stats(self):
+        """Current load, for the "busy" message"""
+        with self.lock:
+            return {"pending": self.pending, "max_pending": self.max_pending, "workers": self.max_workers}
+
+
+# Load test: N concurrent sessions against a stub model
+class StubChunk:
+    def __init__(self, text, finish_reason=None):
+        self.text = text
+        self.candidates = [type("Candidate", (), {"finish_reason": finish_reason})()]
+        self.usage_metadata = None
+
+
+class StubModels:
+    """Stand-in for client.models with fixed latency and random 429s"""
+
+    def __init__(self, ttft=0.5, chunks=10, chunk_interval=0.05, rate_limit_prob=0.1):
+        import random
+        self.random = random.Random(0)
+        self.ttft, self.chunks, self.chunk_interval = ttft, chunks, chunk_interval
+        self.rate_limit_prob = rate_limit_prob
+
+    def generate_content_stream(self, model, contents, config):
+        if self.random.random() < self.rate_limit_prob:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED (stub)")
+        time.sleep(self.ttft)
+        for i in range(self.chunks):
+            yield StubChunk("token ", "STOP" if i == self.chunks - 1 else None)
+            time.sleep(self.chunk_interval)
+
+
+class StubClient:
+    def __init__(self, **kwargs):
+        self.models = StubModels(**kwargs)
+
+
+def load_test(n_sessions=100, workers=max_workers, pending=max_pending, poll_interval=0.1):
+    """Simulate n_sessions submitting at once and polling until done"""
+    pool = GenerationPool(workers, pending)
+    client = StubClient()
+    latencies, waits, rejected, failed = [], [], [0], [0]
+    lock = threading.Lock()
+
+    def session(i):
+        start = time.perf_counter()
+        try:
+            job = pool.submit(f"session-{i}", generate_with_fallback, client, ["stub-a", "stub-b"], "hi", None)
+        except PoolFull:
+            with lock:
+                rejected[0] += 1
+            return
+        while not job.done():
+            job.touch()
+            time.sleep(poll_interval)
+        with lock:
+            if job.error:
+                failed[0] += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+                waits.append(job.started_at - job.submitted_at)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    pool.executor.shutdown()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float("nan")
+    report = {
+        "sessions": n_sessions, "completed": len(latencies), "rejected": rejected[0], "failed": failed[0],
+        "throughput_per_s": round(len(latencies) / elapsed, 2),
+        "p50_s": round(pct(0.50), 2), "p95_s": round(pct(0.95), 2),
+        "p95_queue_wait_s": round(sorted(waits)[min(len(waits) - 1, int(0.95 * len(waits)))], 2) if waits else None,
+    }
+    print(f"👥 {n_sessions} sessions, {workers} workers, {pending} max pending: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    load_test(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -1,13 +1,29 @@
 from google import genai
 import os
+import sys
 from dotenv import load_dotenv
+import model_catalog
 
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 client = genai.Client(api_key=api_key)
 
+# Usage: python list_models.py [--refresh] [--probe [model ...]]
+refresh = "--refresh" in sys.argv
+catalog = model_catalog.load_catalog(client, refresh=refresh)
+
+if "--probe" in sys.argv:
+    model_ids = [a for a in sys.argv[sys.argv.index("--probe") + 1:] if not a.startswith("--")]
+    catalog = model_catalog.probe_all(client, model_ids or None)
+
 print("Listing available models:")
 with open("models.txt", "w") as f:
-    for m in client.models.list(config={"page_size": 100}):
-        f.write(f"{m.name}\n")
-        print(f"Computed: {m.name}")
+    for model_id, info in catalog["models"].items():
+        f.write(f"models/{model_id}\n")
+        probe = catalog["probes"].get(model_id, {})
+        timing = f" | TTFT {probe['ttft_s']}s, {probe['tokens_per_s']} tok/s" if probe.get("ok") else ""
+        print(f"Computed: {model_id} | {','.join(info['input_modalities'])} | "
+              f"ctx {info['context_window']} / out {info['output_limit']}{timing}")
+
+print("\nFallback order:", ", ".join(model_catalog.fallback_order(catalog)))
+print("Fallback order (PDF):", ", ".join(model_catalog.fallback_order(catalog, "application/pdf")))
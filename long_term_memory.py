@@ -0,0 +1,331 @@
+import json
+import os
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+
+# Set Parameters
+memory_dir = os.getenv("AGENT_MEMORY_DIR", ".agent_memory")
+embedding_dim = 256
+top_k = 3
+min_score = 0.15
+rerank_pool = 32  # candidates per result re-scored on exact features (hash collisions cause ties)
+reply_weight = 0.5  # reply's share of a stored turn; the user's own words decide recall
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Function words match almost any turn, so they are left out of the features
+STOP_WORDS = frozenset(
+    "a an the and or but if so of to in on at for with by from about as into than then "
+    "is are was were be been being am do does did have has had will would can could should "
+    "i me my mine you your it its we our they their he him his she her this that these those "
+    "what where when who whom which why how there here please tell know".split()
+)
+
+
+# Embedder
+class HashingEmbedder:
+    """Offline text embedder: hashes words and word pairs into a fixed-size vector"""
+
+    def __init__(self, dim=embedding_dim):
+        self.dim = dim
+
+    def features(self, text):
+        """Lowercase content words (plural/verb -s dropped) plus adjacent word pairs"""
+        words = [
+            word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in TOKEN_PATTERN.findall(text.lower())
+            if word not in STOP_WORDS
+        ]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, text):
+        """Embed a single text into a unit-length float32 vector"""
+        # crc32 is stable across runs (unlike hash()), so stored vectors stay valid
+        hashes = np.array([zlib.crc32(feature.encode("utf-8")) for feature in self.features(text)], dtype=np.int64)
+        signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+        vector = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+# Vector Index
+class VectorIndex:
+    """Append-only on-disk matrix of unit vectors with top-k cosine search"""
+
+    def __init__(self, path, dim=embedding_dim):
+        self.path = path
+        self.dim = dim
+        self.vectors_file = os.path.join(path, "vectors.f32")
+        self.snippets_file = os.path.join(path, "snippets.jsonl")
+        os.makedirs(path, exist_ok=True)
+
+        # Load what is already on disk
+        if os.path.exists(self.vectors_file):
+            stored = np.fromfile(self.vectors_file, dtype=np.float32).reshape(-1, dim)
+        else:
+            stored = np.zeros((0, dim), dtype=np.float32)
+        self.snippets = []
+        if os.path.exists(self.snippets_file):
+            with open(self.snippets_file, "r", encoding="utf-8") as f:
+                self.snippets = [json.loads(line) for line in f]
+
+        # A torn write can leave the two files out of step; keep the common prefix
+        self.count = min(len(stored), len(self.snippets))
+        self.snippets = self.snippets[:self.count]
+        self.matrix = np.zeros((max(self.count, 1024), dim), dtype=np.float32)
+        self.matrix[:self.count] = stored[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, extra):
+        """Grow the in-memory matrix by doubling so appends stay amortised O(1)"""
+        needed = self.count + extra
+        if needed <= len(self.matrix):
+            return
+        capacity = len(self.matrix)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:self.count] = self.matrix[:self.count]
+        self.matrix = grown
+
+    def add_many(self, vectors, snippets):
+        """Append vectors and their snippets to memory and disk"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        self._reserve(len(vectors))
+        self.matrix[self.count:self.count + len(vectors)] = vectors
+        self.count += len(vectors)
+        self.snippets.extend(snippets)
+        with open(self.vectors_file, "ab") as f:
+            vectors.tofile(f)
+        with open(self.snippets_file, "a", encoding="utf-8") as f:
+            for snippet in snippets:
+                f.write(json.dumps(snippet) + "\n")
+
+    def add(self, vector, snippet):
+        """Append a single vector and its snippet"""
+        self.add_many(vector[None, :], [snippet])
+
+    def search(self, query_vector, k=top_k):
+        """Return [(index, score), ...] of the k most similar stored vectors"""
+        if self.count == 0 or k <= 0:
+            return []
+        # Vectors are unit length, so the dot product is the cosine similarity
+        scores = self.matrix[:self.count] @ query_vector
+        if k < self.count:
+            # argpartition is O(n); only the k winners get fully sorted
+            candidates = np.argpartition(scores, self.count - k)[-k:]
+        else:
+            candidates = np.arange(self.count)
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+
+# Long-term Memory
+class LongTermMemory:
+    """Remembers every turn and recalls only the most relevant ones"""
+
+    def __init__(self, path=memory_dir, dim=embedding_dim):
+        self.embedder = HashingEmbedder(dim)
+        self.index = VectorIndex(path, dim)
+
+    def embed_turn(self, user_input, response):
+        """User text and reply are embedded separately, so a long reply can't dilute the user's words"""
+        vector = self.embedder.embed(user_input) + reply_weight * self.embedder.embed(response)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def remember_many(self, turns):
+        """Store [(user_input, response), ...] in one append"""
+        if not turns:
+            return
+        vectors = np.stack([self.embed_turn(user_input, response) for user_input, response in turns])
+        self.index.add_many(vectors, [f"User: {user_input}\nAssistant: {response}" for user_input, response in turns])
+
+    def remember(self, user_input, response):
+        """Store one conversation turn"""
+        self.remember_many([(user_input, response)])
+
+    def search(self, query, k=top_k, min_score=min_score):
+        """[(index, score), ...]: vector top-k*rerank_pool, re-ranked by exact feature overlap"""
+        candidates = self.index.search(self.embedder.embed(query), k * rerank_pool)
+        query_features = set(self.embedder.features(query))
+        if not query_features:
+            return []
+
+        def overlap(text):
+            features = set(self.embedder.features(text))
+            return len(query_features & features) / np.sqrt(len(query_features) * max(len(features), 1))
+
+        scored = []
+        for i, score in candidates:
+            if score < min_score:
+                continue
+            # Same weighting as embed_turn, on exact features
+            user_input, _, response = self.index.snippets[i].removeprefix("User: ").partition("\nAssistant: ")
+            scored.append((overlap(user_input) + reply_weight * overlap(response), score, i))
+        scored.sort(reverse=True)
+        return [(i, score) for _, score, i in scored[:k]]
+
+    def recall(self, query, k=top_k, min_score=min_score):
+        """Return up to k stored snippets relevant to the query"""
+        return [self.index.snippets[i] for i, _ in self.search(query, k, min_score)]
+
+    def recall_block(self, query, k=top_k):
+        """Format recalled snippets for injection into a prompt ('' if none)"""
+        snippets = self.recall(query, k)
+        if not snippets:
+            return ""
+        notes = "\n\n".join(snippets)
+        return f"Relevant notes from earlier conversations:\n{notes}"
+
+
+# LangChain (create_agent) middleware
+def memory_middleware(memory, recent_turns=3):
+    """create_agent middleware: send the last recent_turns exchanges of the thread plus recalled notes.
+
+    Both happen on the model request only, so nothing extra is written to the checkpointer.
+    Put it after caching_middleware() so the notes land after the user turn's cache checkpoint.
+    """
+    from langchain.agents.middleware import wrap_model_call
+    from langchain_core.messages import HumanMessage
+    from prompt_cache import cache_aligned_window
+
+    recalled = {"id": None, "block": ""}  # one recall per user turn, reused across its tool calls
+
+    @wrap_model_call
+    def long_term_recall(request, handler):
+        messages = list(request.messages)
+        turn_starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+        if not turn_starts:
+            return handler(request)
+
+        # Whole turns only (tool calls stay with their results), trimmed in blocks like 4-
+        messages = messages[cache_aligned_window(turn_starts, recent_turns)[0]:]
+
+        current = turn_starts[-1] - (len(request.messages) - len(messages))
+        user_message = messages[current]
+        if recalled["id"] != (user_message.id or user_message.text):
+            recalled["id"] = user_message.id or user_message.text
+            recalled["block"] = memory.recall_block(user_message.text)
+        if recalled["block"]:
+            content = user_message.content
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            notes = {"type": "text", "text": f"\n\n{recalled['block']}"}
+            messages[current] = user_message.model_copy(update={"content": list(content) + [notes]})
+        return handler(request.override(messages=messages))
+
+    return long_term_recall
+
+
+# Benchmark: recall quality and lookup latency
+def benchmark(n_turns=1_000_000, n_queries=200, k=top_k, dim=embedding_dim, seed=0):
+    """Fill an index with synthetic turns, plant known facts and measure recall@k and latency.
+
+    Noise uses the same vocabulary and sentence template as the facts, including
+    hard negatives that share the fact's item or its city (but never both). Every turn
+    gets a 40-90 word reply and goes through remember_many(), and queries go through
+    recall() with the production min_score, as 4- and 6- use them.
+    """
+    import tempfile
+
+    rng = np.random.default_rng(seed)
+    n_items, n_cities = 2000, 500
+    fillers = ["my", "favourite", "is", "sold", "in", "near", "the", "river", "where", "shop",
+               "buy", "cheap", "market", "open", "today", "price", "station", "best", "old", "new"]
+    vocabulary = fillers + [f"item{i}" for i in range(n_items)] + [f"city{i}" for i in range(n_cities)]
+    reply_words = ["great", "choice", "sounds", "lovely", "local", "market", "visit", "weekend", "prices", "quality",
+                   "recommend", "try", "morning", "crowded", "worth", "trip", "friends", "season", "fresh", "stall"]
+    template = "my favourite {item} is sold in {city} near the river"
+
+    def reply(mention):
+        """Chatty assistant reply that echoes the turn's item or city"""
+        return f"Noted, {mention} it is! " + " ".join(rng.choice(reply_words, size=rng.integers(40, 90))) + "."
+
+    # Planted facts: one (item, city) pair each, never repeated by the noise
+    fact_items = rng.choice(n_items, size=n_queries, replace=False)
+    fact_cities = rng.integers(0, n_cities, size=n_queries)
+    planted = set(zip(fact_items.tolist(), fact_cities.tolist()))
+
+    with tempfile.TemporaryDirectory() as path:
+        memory = LongTermMemory(path, dim)
+        index = memory.index
+
+        # Background noise, remembered in batches:
+        # half templated hard negatives (shared item or city), half chatter from the same vocabulary
+        print(f"📚 Indexing {n_turns:,} turns...")
+        start = time.perf_counter()
+        batch = 10_000
+        for offset in range(0, n_turns - n_queries, batch):
+            size = min(batch, n_turns - n_queries - offset)
+            turns = []
+            for _ in range(size // 2):
+                f = rng.integers(0, n_queries)
+                if rng.random() < 0.5:
+                    item, city = int(fact_items[f]), int(rng.integers(0, n_cities))
+                else:
+                    item, city = int(rng.integers(0, n_items)), int(fact_cities[f])
+                if (item, city) in planted:
+                    city = (city + 1) % n_cities
+                turns.append((template.format(item=f"item{item}", city=f"city{city}"), reply(f"item{item}")))
+            word_ids = rng.integers(0, len(vocabulary), size=(size - len(turns), 12))
+            turns += [(" ".join(vocabulary[j] for j in row), reply(vocabulary[row[0]])) for row in word_ids]
+            memory.remember_many(turns)
+        print(f"   done in {time.perf_counter() - start:.1f}s")
+
+        # Each fact has a paraphrased query that should recall it
+        facts = []
+        for item, city in zip(fact_items, fact_cities):
+            fact = (template.format(item=f"item{item}", city=f"city{city}"), reply(f"city{city}"))
+            memory.remember(*fact)
+            facts.append((f"where is my favourite item{item} sold in city{city}?", index.snippets[-1]))
+
+        hits = 0
+        latencies = []
+        for query, fact in facts:
+            start = time.perf_counter()
+            results = memory.recall(query, k)
+            latencies.append(time.perf_counter() - start)
+            hits += fact in results
+
+    latencies_ms = np.array(latencies) * 1000
+    report = {
+        "turns": len(index),
+        "recall_at_k": hits / n_queries,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+    print(f"✅ recall@{k}: {report['recall_at_k']:.3f}  "
+          f"p50: {report['p50_ms']:.1f} ms  p95: {report['p95_ms']:.1f} ms")
+    return report
+
+
+def check(report, min_recall, max_p95_ms):
+    """Exit 1 if recall or latency misses its threshold (for CI / repeated runs)"""
+    failures = []
+    if report["recall_at_k"] < min_recall:
+        failures.append(f"recall@k {report['recall_at_k']:.3f} < {min_recall}")
+    if report["p95_ms"] > max_p95_ms:
+        failures.append(f"p95 {report['p95_ms']:.1f} ms > {max_p95_ms} ms")
+    if failures:
+        print(f"❌ {'; '.join(failures)}")
+        sys.exit(1)
+    print("✅ Within thresholds")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure long-term memory recall@k and lookup latency")
+    parser.add_argument("n_turns", nargs="?", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-recall", type=float, default=0.95, help="fail below this recall@k")
+    parser.add_argument("--max-p95-ms", type=float, default=250.0, help="fail above this p95 lookup latency")
+    args = parser.parse_args()
+    check(benchmark(args.n_turns, seed=args.seed), args.min_recall, args.max_p95_ms)
@@ -0,0 +1,131 @@
+import sys
+import time
+import tracemalloc
+from array import array
+
+# Converse roles, stored as one byte per message
+ROLES = ("user", "assistant")
+ROLE_IDS = {role: i for i, role in enumerate(ROLES)}
+
+
+class MessageStore:
+    """Append-only conversation history: roles and UTF-8 texts packed into arrays.
+
+    Reads like a list of Converse messages: len(), store[i] and store[a:b] return
+    {"role": ..., "content": [{"text": ...}]} dicts. The dicts for the recent tail
+    (cache_size to 2 * cache_size - 1 messages) are built once at append time and
+    kept in a list, so a recent window is a plain list slice that reuses them. Treat
+    them as read-only: with_history_cache_point from prompt_cache.py copies the one
+    message it changes. Older messages are decoded on demand.
+    """
+
+    __slots__ = ("roles", "offsets", "buffer", "tail", "tail_start", "cache_size")
+
+    def __init__(self, cache_size=16):
+        self.roles = array("B")        # index into ROLES
+        self.offsets = array("Q", [0])  # message i is buffer[offsets[i]:offsets[i + 1]]
+        self.buffer = bytearray()
+        self.tail = []                  # message dicts for indices tail_start..len - 1
+        self.tail_start = 0
+        self.cache_size = cache_size
+
+    def _extend(self, messages):
+        """Append [(role, text), ...]; everything is encoded first so a failure changes nothing"""
+        encoded = [(ROLE_IDS[role], text, text.encode("utf-8")) for role, text in messages]
+        for role_id, text, data in encoded:
+            self.buffer += data
+            self.roles.append(role_id)
+            self.offsets.append(len(self.buffer))
+            self.tail.append({"role": ROLES[role_id], "content": [{"text": text}]})
+        if len(self.tail) >= 2 * self.cache_size:
+            del self.tail[:self.cache_size]
+            self.tail_start += self.cache_size
+
+    def append(self, role, text):
+        self._extend([(role, text)])
+
+    def add_turn(self, user_input, response):
+        """Append a user message and the assistant's reply (both or neither)"""
+        self._extend([("user", user_input), ("assistant", response)])
+
+    def text(self, index):
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def message(self, index):
+        """Converse message dict for one stored message"""
+        if index >= self.tail_start:
+            return self.tail[index - self.tail_start]
+        return {"role": ROLES[self.roles[index]], "content": [{"text": self.text(index)}]}
+
+    def __len__(self):
+        return len(self.roles)
+
+    def __getitem__(self, index):
+        if index.__class__ is slice:
+            # Hot path (cache_aligned_window's history[start:]): a plain slice of the tail's dicts
+            start = index.start
+            if index.stop is None and index.step is None and start is not None and start >= self.tail_start:
+                return self.tail[start - self.tail_start:]
+            start, stop, step = index.indices(len(self.roles))
+            if step == 1 and start >= self.tail_start:
+                return self.tail[start - self.tail_start:max(stop - self.tail_start, 0)]
+            return [self.message(i) for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return self.message(index)
+
+    def __iter__(self):
+        return (self.message(i) for i in range(len(self)))
+
+
+# Benchmark against the nested-dict history used before
+def benchmark(n_turns=1000, window=6, text_len=200):
+    """Memory per n_turns and per-turn update + payload build time, list of dicts vs MessageStore"""
+    from prompt_cache import cache_aligned_window, with_history_cache_point
+
+    user_text = "u" * text_len
+    reply_text = "a" * text_len
+
+    def dict_turns():
+        history = []
+        for i in range(n_turns):
+            # as 4-agent_memory.py did: update_memory copied the list every turn
+            history = history.copy()
+            history.append({"role": "user", "content": [{"text": f"{i} {user_text}"}]})
+            history.append({"role": "assistant", "content": [{"text": f"{i} {reply_text}"}]})
+        return history
+
+    def store_turns():
+        store = MessageStore()
+        for i in range(n_turns):
+            store.add_turn(f"{i} {user_text}", f"{i} {reply_text}")
+        return store
+
+    def build_payload(history):
+        messages = list(cache_aligned_window(history, window))
+        messages.append({"role": "user", "content": [{"text": user_text}]})
+        return with_history_cache_point(messages)
+
+    print(f"📊 {n_turns:,} turns, {text_len}-char messages, window {window}")
+    for name, make in [("list of dicts", dict_turns), ("MessageStore", store_turns)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        history = make()
+        update_s = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        calls = 10_000
+        start = time.perf_counter()
+        for _ in range(calls):
+            build_payload(history)
+        build_us = (time.perf_counter() - start) / calls * 1e6
+
+        print(f"   {name:<14} memory {memory / 1024:8.1f} KiB per {n_turns:,} turns | "
+              f"updates {update_s / n_turns * 1e6:8.1f} µs/turn | payload build {build_us:6.1f} µs/call")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
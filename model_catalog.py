@@ -0,0 +1,172 @@
+import json
+import os
+import time
+
+from google.genai import types
+
+# Set Parameters
+catalog_file = os.getenv("MODEL_CATALOG_FILE", ".model_catalog.json")
+catalog_ttl = 24 * 60 * 60  # seconds before the model listing is fetched again
+probe_prompt = "Write three sentences about billboard advertising in Dhaka."
+probe_max_tokens = 256
+
+# Default order when no model has been probed yet (fastest / best quota first)
+preferred_models = [
+    "gemini-2.5-flash",
+    "gemini-2.0-flash",
+    "gemini-2.5-flash-lite",
+    "gemini-2.0-flash-lite",
+    "gemini-flash-latest",
+    "gemini-2.0-flash-001",
+    "gemini-2.5-pro",
+]
+
+
+def short_name(name):
+    """models/gemini-2.5-flash -> gemini-2.5-flash"""
+    return name.split("/", 1)[-1]
+
+
+def infer_modalities(model_id):
+    """Input modalities by model family (the list API does not report them)"""
+    if "embedding" in model_id or "tts" in model_id or "image-generation" in model_id:
+        return ["text"]
+    if model_id.startswith("gemma"):
+        return ["text", "image"]
+    if model_id.startswith("gemini"):
+        return ["text", "image", "pdf", "audio", "video"]
+    return ["text"]
+
+
+def mime_to_modality(mime_type):
+    """image/png -> image, application/pdf -> pdf"""
+    if mime_type == "application/pdf":
+        return "pdf"
+    return mime_type.split("/", 1)[0]
+
+
+# Catalog Cache
+def fetch_models(client):
+    """List models from the API with their capability metadata"""
+    models = {}
+    for m in client.models.list(config={"page_size": 100}):
+        model_id = short_name(m.name)
+        models[model_id] = {
+            "display_name": m.display_name,
+            "input_modalities": infer_modalities(model_id),
+            "context_window": m.input_token_limit,
+            "output_limit": m.output_token_limit,
+            "supported_actions": list(m.supported_actions or []),
+        }
+    return models
+
+
+def read_cache(path=catalog_file):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"fetched_at": 0, "models": {}, "probes": {}}
+
+
+def write_cache(catalog, path=catalog_file):
+    with open(path, "w") as f:
+        json.dump(catalog, f, indent=2)
+
+
+def load_catalog(client, ttl=catalog_ttl, refresh=False, path=catalog_file):
+    """Return the cached catalog, refreshing the model listing when older than ttl"""
+    catalog = read_cache(path)
+    if refresh or time.time() - catalog.get("fetched_at", 0) > ttl:
+        try:
+            catalog["models"] = fetch_models(client)
+            catalog["fetched_at"] = time.time()
+            write_cache(catalog, path)
+        except Exception as e:
+            # Keep serving the stale listing (or the built-in defaults) if the API is unreachable
+            print(f"⚠️ Could not refresh model catalog: {e}")
+    catalog.setdefault("probes", {})
+    return catalog
+
+
+# Probe / Benchmark
+def probe_model(client, model_id, prompt=probe_prompt, max_tokens=probe_max_tokens):
+    """Measure time to first token and output throughput with a streamed call"""
+    start = time.perf_counter()
+    first_token_at = None
+    output_tokens = 0
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=model_id,
+            contents=prompt,
+            config=types.GenerateContentConfig(max_output_tokens=max_tokens)
+        ):
+            if first_token_at is None and chunk.text:
+                first_token_at = time.perf_counter()
+            if chunk.usage_metadata and chunk.usage_metadata.candidates_token_count:
+                output_tokens = chunk.usage_metadata.candidates_token_count
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:200], "measured_at": time.time()}
+    end = time.perf_counter()
+    if first_token_at is None:
+        return {"ok": False, "error": "empty response", "measured_at": time.time()}
+    generation_time = end - first_token_at
+    return {
+        "ok": True,
+        "ttft_s": round(first_token_at - start, 3),
+        "total_s": round(end - start, 3),
+        "output_tokens": output_tokens,
+        "tokens_per_s": round(output_tokens / generation_time, 1) if generation_time > 0 else None,
+        "measured_at": time.time(),
+    }
+
+
+def probe_all(client, model_ids=None, path=catalog_file):
+    """Probe each model and store the measurements in the catalog cache"""
+    catalog = load_catalog(client, path=path)
+    if model_ids is None:
+        model_ids = [m for m in preferred_models if m in catalog["models"]] or preferred_models
+    for model_id in model_ids:
+        print(f"⏱️ Probing {model_id}...")
+        result = probe_model(client, model_id)
+        catalog["probes"][model_id] = result
+        if result["ok"]:
+            print(f"   TTFT {result['ttft_s']}s, {result['tokens_per_s']} tok/s")
+        else:
+            print(f"   ❌ {result['error']}")
+    write_cache(catalog, path)
+    return catalog
+
+
+# Fallback Order
+def is_compatible(model_id, info, attachment_mime=None):
+    """Model can generate text and accepts the attached file type"""
+    if info is None:
+        # Not listed (e.g. catalog unavailable): trust the family rules
+        modalities = infer_modalities(model_id)
+    else:
+        if "generateContent" not in info.get("supported_actions", []):
+            return False
+        modalities = info.get("input_modalities", infer_modalities(model_id))
+    return attachment_mime is None or mime_to_modality(attachment_mime) in modalities
+
+
+def fallback_order(catalog, attachment_mime=None):
+    """Available, compatible models: fastest measured first, then the preferred defaults"""
+    models = catalog.get("models", {})
+    probes = catalog.get("probes", {})
+
+    candidates = [m for m in preferred_models if not models or m in models]
+    candidates += [m for m, p in probes.items() if p.get("ok") and m in models and m not in candidates]
+    candidates = [m for m in candidates if is_compatible(m, models.get(m), attachment_mime)]
+
+    def rank(model_id):
+        # Measured models by TTFT, then unmeasured in preferred order, then models whose
+        # last probe failed (kept rather than dropped, since quota errors recover)
+        probe = probes.get(model_id, {})
+        if probe.get("ok"):
+            return (0, probe["ttft_s"])
+        preferred = preferred_models.index(model_id) if model_id in preferred_models else len(preferred_models)
+        return (1 if not probe else 2, preferred)
+
+    return sorted(candidates, key=rank)
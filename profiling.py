@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+
+# Set Parameters
+profile_prefix = os.getenv("AGENT_PROFILE_PREFIX", "profile")
+
+
+class _NullSpan:
+    """Shared do-nothing span returned when profiling is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start", "frame")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        # frame = [name, time spent in child spans]
+        self.frame = [self.name, 0]
+        self.profiler._stack().append(self.frame)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        stack = self.profiler._stack()
+        path = ";".join(frame[0] for frame in stack)
+        stack.pop()
+        duration = end - self.start
+        if stack:
+            stack[-1][1] += duration
+        self.profiler._record(self.name, path, self.start, duration, duration - self.frame[1])
+        return False
+
+
+class Profiler:
+    """Nested stage timers; near-zero overhead when disabled"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []  # (name, path, start_ns, duration_ns, self_ns, thread_id, turn)
+        self.current_turn = 0
+        self.origin = time.perf_counter_ns()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, name, path, start, duration, self_time):
+        with self._lock:
+            self.events.append((name, path, start, duration, self_time, threading.get_ident(), self.current_turn))
+
+    def span(self, name):
+        """Time a stage: `with profiler.span("converse"): ...`"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def turn(self):
+        """Root span for one user turn"""
+        if not self.enabled:
+            return NULL_SPAN
+        self.current_turn += 1
+        return _Span(self, "turn")
+
+    # Reports
+    def turn_summary(self, turn=None):
+        """One line of stage timings for a turn (default: the last one)"""
+        turn = self.current_turn if turn is None else turn
+        stages = [(e[0], e[3]) for e in self.events if e[6] == turn]
+        total = next((d for name, d in stages if name == "turn"), None)
+        parts = [f"{name} {d / 1e6:.1f}ms" for name, d in stages if name != "turn"]
+        if total is not None:
+            parts.append(f"total {total / 1e6:.1f}ms")
+        return "⏱️ " + " | ".join(parts)
+
+    def stage_stats(self):
+        """{stage: {count, p50_ms, p95_ms, total_ms}}"""
+        durations = {}
+        for name, _, _, duration, _, _, _ in self.events:
+            durations.setdefault(name, []).append(duration / 1e6)
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+            stats[name] = {
+                "count": len(values),
+                "p50_ms": round(pick(0.50), 3),
+                "p95_ms": round(pick(0.95), 3),
+                "total_ms": round(sum(values), 3),
+            }
+        return stats
+
+    def report(self):
+        lines = [f"{'stage':<18}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'total ms':>12}"]
+        for name, s in sorted(self.stage_stats().items(), key=lambda kv: -kv[1]["total_ms"]):
+            lines.append(f"{name:<18}{s['count']:>7}{s['p50_ms']:>11.1f}{s['p95_ms']:>11.1f}{s['total_ms']:>12.1f}")
+        return "\n".join(lines)
+
+    def collapsed_stacks(self):
+        """Flamegraph input: 'turn;converse 1234' with self time in microseconds"""
+        totals = {}
+        for _, path, _, _, self_time, _, _ in self.events:
+            totals[path] = totals.get(path, 0) + self_time
+        return "\n".join(f"{path} {ns // 1000}" for path, ns in totals.items() if ns >= 1000)
+
+    def chrome_trace(self):
+        """chrome://tracing / Perfetto JSON with one complete ("X") event per span"""
+        pid = os.getpid()
+        return {"traceEvents": [
+            {
+                "name": name, "cat": "agent", "ph": "X", "pid": pid, "tid": tid,
+                "ts": (start - self.origin) / 1000, "dur": duration / 1000,
+                "args": {"turn": turn},
+            }
+            for name, _, start, duration, _, tid, turn in self.events
+        ]}
+
+    def save(self, prefix=profile_prefix):
+        """Print the aggregated report and write <prefix>.folded and <prefix>.trace.json"""
+        if not self.enabled or not self.events:
+            return
+        print(self.report())
+        with open(f"{prefix}.folded", "w") as f:
+            f.write(self.collapsed_stacks() + "\n")
+        with open(f"{prefix}.trace.json", "w") as f:
+            json.dump(self.chrome_trace(), f)
+        print(f"📊 Profile written to {prefix}.folded (flamegraph.pl) and {prefix}.trace.json (chrome://tracing)")
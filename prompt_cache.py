@@ -0,0 +1,137 @@
+import os
+
+# Set Parameters
+# Cache checkpoints are ignored by Bedrock below the model's minimum prefix size
+# (1,024 tokens for Claude Sonnet), so enabling them on short prompts is harmless.
+prompt_cache = os.getenv("BEDROCK_PROMPT_CACHE", "1") != "0"
+cache_read_price = 0.1    # cached input tokens, relative to normal input price
+cache_write_price = 1.25  # input tokens written to the cache, relative to normal input price
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+
+# Raw Converse helpers
+def cached_system(system_message):
+    """system= payload with a checkpoint after the (stable) system prompt"""
+    system = [{"text": system_message}]
+    if prompt_cache:
+        system.append(CACHE_POINT)
+    return system
+
+
+def cached_tools(tool_specs):
+    """toolConfig["tools"] with a checkpoint after the tool definitions"""
+    tools = [{"toolSpec": spec} for spec in tool_specs]
+    if prompt_cache:
+        tools.append(CACHE_POINT)
+    return tools
+
+
+def with_history_cache_point(messages):
+    """Copy of messages with a checkpoint at the end of the history (before the new user turn)"""
+    if not prompt_cache or len(messages) < 2:
+        return list(messages)
+    messages = list(messages)
+    last = messages[-2]
+    messages[-2] = {"role": last["role"], "content": list(last["content"]) + [CACHE_POINT]}
+    return messages
+
+
+def cache_aligned_window(history, size):
+    """Last `size`..2*size-1 messages, trimmed in whole blocks so the cached prefix stays put"""
+    if len(history) <= size:
+        return history
+    start = (len(history) - size) // size * size
+    return history[start:]
+
+
+# Usage reporting
+class CacheStats:
+    """Accumulates Converse usage to show what the cache saved"""
+
+    def __init__(self):
+        self.input_tokens = 0
+        self.cache_read = 0
+        self.cache_write = 0
+        self.calls = 0
+
+    def add(self, usage):
+        """Add one Converse `usage` dict; returns a one-line summary for this call"""
+        usage = usage or {}
+        read = usage.get("cacheReadInputTokens", 0)
+        write = usage.get("cacheWriteInputTokens", 0)
+        uncached = usage.get("inputTokens", 0)
+        self.calls += 1
+        self.input_tokens += uncached
+        self.cache_read += read
+        self.cache_write += write
+        return f"💾 Cache: read {read} / write {write} / uncached input {uncached} tokens"
+
+    def add_langchain(self, messages):
+        """Add usage from the AI messages of the latest turn (after the last human message)"""
+        turn = []
+        for message in reversed(messages):
+            if type(message).__name__ == "HumanMessage":
+                break
+            turn.append(message)
+        read = write = uncached = 0
+        for message in turn:
+            usage = getattr(message, "usage_metadata", None)
+            if not usage:
+                continue
+            details = usage.get("input_token_details", {}) or {}
+            read += details.get("cache_read", 0)
+            write += details.get("cache_creation", 0)
+            # LangChain's input_tokens includes cached tokens
+            uncached += usage.get("input_tokens", 0) - details.get("cache_read", 0) - details.get("cache_creation", 0)
+        return self.add({"cacheReadInputTokens": read, "cacheWriteInputTokens": write, "inputTokens": uncached})
+
+    def summary(self):
+        """Session totals and input cost relative to sending everything uncached"""
+        total = self.input_tokens + self.cache_read + self.cache_write
+        if total == 0:
+            return "💾 Cache: no usage recorded"
+        cost = self.input_tokens + self.cache_read * cache_read_price + self.cache_write * cache_write_price
+        return (f"💾 Cache over {self.calls} calls: {self.cache_read} read, {self.cache_write} written, "
+                f"{self.input_tokens} uncached input tokens; input cost {cost / total:.0%} of uncached")
+
+
+# LangChain (create_agent) middleware
+def caching_middleware():
+    """create_agent middleware that checkpoints the system prompt (and tools before it) and the history.
+
+    Needs the Converse API: ChatBedrock(..., beta_use_converse_api=True) or ChatBedrockConverse,
+    and langchain>=1.1 (ModelRequest.system_message).
+    """
+    from langchain.agents.middleware import AgentMiddleware
+    from langchain_core.messages import HumanMessage
+
+    def with_cache_point(message):
+        content = message.content
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        return message.model_copy(update={"content": list(content) + [CACHE_POINT]})
+
+    def cached_request(request):
+        if not prompt_cache:
+            return request
+        messages = list(request.messages)
+
+        # Checkpoint the newest user turn: next turn's prefix starts with everything up to here
+        if messages and isinstance(messages[-1], HumanMessage):
+            messages[-1] = with_cache_point(messages[-1])
+
+        # Tool definitions precede the system prompt, so this checkpoint covers both
+        if request.system_message is not None:
+            return request.override(system_message=with_cache_point(request.system_message), messages=messages)
+        return request.override(messages=messages)
+
+    # Sync and async hooks, so the same middleware works with invoke() and astream()
+    class BedrockPromptCache(AgentMiddleware):
+        def wrap_model_call(self, request, handler):
+            return handler(cached_request(request))
+
+        async def awrap_model_call(self, request, handler):
+            return await handler(cached_request(request))
+
+    return BedrockPromptCache()
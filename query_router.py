@@ -0,0 +1,136 @@
+import re
+
+# Set Parameters
+default_budget = 8192                                   # max_output_tokens every prompt used before routing
+default_models = ["gemini-2.5-flash", "gemini-2.0-flash"]  # model tier every prompt used before routing
+
+# Query class -> model tier, output budget and thinking budget
+# (on thinking models, thinking tokens count against max_output_tokens)
+QUERY_CLASSES = {
+    "lookup": {
+        "label": "Lookup",
+        "models": ["gemini-2.5-flash-lite", "gemini-2.0-flash-lite"],
+        "max_output_tokens": 1024,
+        "thinking_budget": 0,
+    },
+    "comparison": {
+        "label": "Comparison",
+        "models": ["gemini-2.5-flash", "gemini-2.0-flash"],
+        "max_output_tokens": 4096,
+        "thinking_budget": 1024,
+    },
+    "full_report": {
+        "label": "Full report",
+        "models": ["gemini-2.5-flash", "gemini-2.0-flash"],
+        "max_output_tokens": 8192,
+        "thinking_budget": 2048,
+    },
+}
+
+# Places in the knowledge base; several in one prompt means a bigger answer
+PLACES = [
+    "dhaka", "gulshan", "banani", "dhanmondi", "mohakhali", "uttara", "mirpur", "motijheel",
+    "farmgate", "bashundhara", "tejgaon", "chittagong", "chattogram", "sylhet", "cox's bazar",
+    "rajshahi", "rangpur", "khulna", "barisal", "comilla", "cumilla", "feni", "bogura",
+    "narayanganj", "gazipur", "mymensingh",
+]
+
+COMPARE_WORDS = re.compile(r"\b(compare|comparison|vs\.?|versus|difference|differences|better than|cheaper than)\b", re.I)
+REPORT_WORDS = re.compile(
+    r"\b(strateg\w*|analy[sz]\w*|recommend\w*|report|overview|breakdown|evaluat\w*|plan|campaign|landscape)\b", re.I
+)
+LIST_WORDS = re.compile(r"\b(explain\w*|why|options|locations|spots|top|best|identify)\b", re.I)
+
+
+# Classifier
+def classify(prompt, has_attachment=False):
+    """Rule-based: lookup (short factual), comparison, or full_report"""
+    text = prompt.lower()
+    n_words = len(text.split())
+    n_places = sum(1 for place in PLACES if place in text)
+
+    if n_places >= 3 or n_words > 60:
+        return "full_report"
+    if COMPARE_WORDS.search(text) or n_places == 2:
+        return "comparison"
+    if REPORT_WORDS.search(text):
+        return "full_report"
+    if LIST_WORDS.search(text) or has_attachment or n_words > 25:
+        # Several options, an attachment to read, or a long question: needs room
+        return "comparison"
+    return "lookup"
+
+
+def route(prompt, fallback_models, has_attachment=False, override=None, max_tokens_cap=default_budget):
+    """Pick the query class, reorder the fallback list to try its tier first, and set the output budget"""
+    query_class = override or classify(prompt, has_attachment)
+    config = QUERY_CLASSES[query_class]
+    preferred = [m for m in config["models"] if m in fallback_models]
+    max_output_tokens = min(config["max_output_tokens"], max_tokens_cap)
+    return {
+        "query_class": query_class,
+        "auto": override is None,
+        "models": preferred + [m for m in fallback_models if m not in preferred],
+        "max_output_tokens": max_output_tokens,
+        # Leave at least 3/4 of the budget for the answer itself
+        "thinking_budget": min(config["thinking_budget"], max_output_tokens // 4),
+    }
+
+
+def is_thinking_model(model_id):
+    return model_id.startswith("gemini-2.5") or model_id.endswith("-latest")
+
+
+def model_config(route, model_id, config):
+    """Copy of a GenerateContentConfig with the route's thinking budget, for models that think"""
+    if not is_thinking_model(model_id):
+        return config  # 2.0 models reject thinking_config
+    from google.genai import types
+    budget = route["thinking_budget"]
+    if "pro" in model_id:
+        budget = max(budget, 128)  # Pro cannot turn thinking off
+    return config.model_copy(update={"thinking_config": types.ThinkingConfig(thinking_budget=budget)})
+
+
+# Usage vs. the default (flash tier, 8192 tokens)
+def probe_estimate(catalog, model_id, output_tokens):
+    """Probe-based seconds to write output_tokens on model_id (None if not probed)"""
+    probe = catalog.get("probes", {}).get(model_id, {})
+    if not probe.get("ok") or not probe.get("tokens_per_s"):
+        return None
+    return probe["ttft_s"] + output_tokens / probe["tokens_per_s"]
+
+
+def estimate_savings(route, model_id, latency_s, usage, catalog):
+    """Tokens actually used, plus probe-based estimates for this model and the default tier.
+
+    Both estimates use the same short-prompt probes from list_models.py --probe, so they are
+    comparable with each other but not with latency_s (which includes the knowledge-base
+    prompt and any retry back-off).
+    """
+    output_tokens = (getattr(usage, "candidates_token_count", None) or 0) if usage else 0
+    thinking_tokens = (getattr(usage, "thoughts_token_count", None) or 0) if usage else 0
+    default_model = next((m for m in default_models if probe_estimate(catalog, m, 1) is not None), None)
+    return {
+        "latency_s": latency_s,
+        "output_tokens": output_tokens,
+        "thinking_tokens": thinking_tokens,
+        "estimate_s": probe_estimate(catalog, model_id, output_tokens + thinking_tokens),
+        "default_model": default_model,
+        # Lower bound: assumes the default model would have written the same number of tokens
+        "default_estimate_s": probe_estimate(catalog, default_model, output_tokens) if default_model else None,
+    }
+
+
+def format_savings(route, savings):
+    label = QUERY_CLASSES[route["query_class"]]["label"]
+    mode = "auto" if route["auto"] else "manual"
+    used = savings["output_tokens"] + savings["thinking_tokens"]
+    text = f"🧭 {label} ({mode}) · used {used} of {route['max_output_tokens']} tokens"
+    if savings["thinking_tokens"]:
+        text += f" ({savings['thinking_tokens']} thinking)"
+    text += f" · {savings['latency_s']:.1f}s actual"
+    if savings["estimate_s"] is not None and savings["default_estimate_s"] is not None:
+        text += (f" · est. {savings['estimate_s']:.1f}s here vs ~{savings['default_estimate_s']:.1f}s "
+                 f"on {savings['default_model']} (probe-based)")
+    return text
@@ -0,0 +1,220 @@
+import contextvars
+import random
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+# Stand-ins for Bedrock Converse, Gemini and a LangChain chat model, with configurable
+# latency (TTFT + token rate) and injected 429s. Used by benchmark.py.
+
+
+class StubConfig:
+    def __init__(self, ttft=0.2, token_rate=200.0, output_tokens=40, rate_limit_prob=0.0, seed=0):
+        self.ttft = ttft                        # seconds before the first token
+        self.token_rate = token_rate            # output tokens per second
+        self.output_tokens = output_tokens      # tokens in a prose reply
+        self.rate_limit_prob = rate_limit_prob  # chance that a call raises a 429
+        self.random = random.Random(seed)
+
+
+class StubStats:
+    """Thread-safe call counters for one benchmark scenario"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+        self.prompt_chars = 0
+
+    def record(self, prompt_chars):
+        with self.lock:
+            self.calls += 1
+            self.prompt_chars += prompt_chars
+
+
+settings = StubConfig()
+stats = StubStats()
+
+# Warm-up turns (building up history) skip the simulated latency
+fast_mode = contextvars.ContextVar("fast_mode", default=False)
+
+
+def begin_call(prompt_chars):
+    """Count the call and maybe raise a 429, like the real services (warm-up calls are not counted)"""
+    if fast_mode.get():
+        return
+    stats.record(prompt_chars)
+    with stats.lock:
+        limited = settings.random.random() < settings.rate_limit_prob
+        if limited:
+            stats.rate_limited += 1
+    if limited:
+        raise RuntimeError("429 RESOURCE_EXHAUSTED: ThrottlingException (stub)")
+
+
+def wait(seconds):
+    if not fast_mode.get():
+        time.sleep(seconds)
+
+
+def reply_latency(n_tokens):
+    """Seconds to produce a whole reply of n_tokens"""
+    return settings.ttft + n_tokens / settings.token_rate
+
+
+def prose(n_tokens=None):
+    return " ".join(["word"] * (n_tokens or settings.output_tokens))
+
+
+# Bedrock Converse
+class StubBedrock:
+    """bedrock-runtime client with converse / converse_stream"""
+
+    def _prompt_chars(self, request):
+        chars = sum(len(block.get("text", "")) for block in request.get("system", []))
+        for message in request.get("messages", []):
+            chars += sum(len(block.get("text", "")) for block in message["content"])
+        return chars
+
+    def _reply(self, request):
+        """Tool JSON for the JSON-tool agents when the user asks for a tool, otherwise prose"""
+        system = " ".join(block.get("text", "") for block in request.get("system", []))
+        user_text = request["messages"][-1]["content"][0]["text"].lower()
+        if "respond ONLY with a JSON" in system:
+            if "weather" in user_text:
+                return '{"tool": "get_weather", "input": "Paris"}'
+            if "calculate" in user_text:
+                return '{"tool": "calculator", "input": "5 * (4 + 3)"}'
+        return prose()
+
+    def _usage(self, request, reply):
+        return {
+            "inputTokens": self._prompt_chars(request) // 4,
+            "outputTokens": len(reply.split()),
+            "cacheReadInputTokens": 0,
+            "cacheWriteInputTokens": 0,
+        }
+
+    def converse(self, **request):
+        begin_call(self._prompt_chars(request))
+        reply = self._reply(request)
+        wait(reply_latency(len(reply.split())))
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": reply}]}},
+            "stopReason": "end_turn",
+            "usage": self._usage(request, reply),
+        }
+
+    def converse_stream(self, **request):
+        begin_call(self._prompt_chars(request))
+        reply = self._reply(request)
+
+        def events():
+            yield {"messageStart": {"role": "assistant"}}
+            wait(settings.ttft)
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                yield {"contentBlockDelta": {"delta": {"text": word if i == 0 else " " + word}, "contentBlockIndex": 0}}
+                wait(1 / settings.token_rate)
+            yield {"messageStop": {"stopReason": "end_turn"}}
+            yield {"metadata": {"usage": self._usage(request, reply)}}
+
+        return {"stream": events()}
+
+
+# Gemini (google-genai)
+def _gemini_prompt_chars(contents, generation_config):
+    items = contents if isinstance(contents, list) else [contents]
+    chars = sum(len(item) for item in items if isinstance(item, str))
+    system = getattr(generation_config, "system_instruction", None)
+    return chars + (len(system) if isinstance(system, str) else 0)
+
+
+def _gemini_response(text, prompt_chars, finish_reason="STOP"):
+    return SimpleNamespace(
+        text=text,
+        candidates=[SimpleNamespace(finish_reason=finish_reason)],
+        usage_metadata=SimpleNamespace(prompt_token_count=prompt_chars // 4,
+                                       candidates_token_count=len(text.split())),
+    )
+
+
+class StubGeminiModels:
+    def generate_content(self, model, contents, config=None):
+        prompt_chars = _gemini_prompt_chars(contents, config)
+        begin_call(prompt_chars)
+        reply = prose()
+        wait(reply_latency(len(reply.split())))
+        return _gemini_response(reply, prompt_chars)
+
+    def generate_content_stream(self, model, contents, config=None):
+        prompt_chars = _gemini_prompt_chars(contents, config)
+        begin_call(prompt_chars)
+        words = prose().split(" ")
+        wait(settings.ttft)
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            chunk = _gemini_response(word + ("" if last else " "), prompt_chars, "STOP" if last else None)
+            if not last:
+                chunk.usage_metadata = None
+            yield chunk
+            wait(1 / settings.token_rate)
+
+    def list(self, config=None):
+        for name in ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-2.5-flash-lite", "gemini-2.0-flash-lite"]:
+            yield SimpleNamespace(
+                name=f"models/{name}", display_name=name,
+                input_token_limit=1_048_576, output_token_limit=8192,
+                supported_actions=["generateContent", "countTokens"],
+            )
+
+
+class StubGenaiClient:
+    """google.genai.Client replacement"""
+
+    def __init__(self, *args, **kwargs):
+        self.models = StubGeminiModels()
+
+
+# LangChain chat model
+def stub_chat_model():
+    """BaseChatModel that calls the first bound tool on a new user message, otherwise answers"""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    class StubChatModel(BaseChatModel):
+        bound_tools: list = []
+
+        @property
+        def _llm_type(self):
+            return "stub"
+
+        def bind_tools(self, tools, **kwargs):
+            return self.model_copy(update={"bound_tools": [convert_to_openai_tool(t) for t in tools]})
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt_chars = sum(len(str(m.content)) for m in messages)
+            begin_call(prompt_chars)
+            if type(messages[-1]).__name__ == "HumanMessage" and self.bound_tools:
+                function = self.bound_tools[0]["function"]
+                properties = function.get("parameters", {}).get("properties", {})
+                args = {k: 7.0 if v.get("type") in ("number", "integer") else "Paris" for k, v in properties.items()}
+                wait(settings.ttft)
+                message = AIMessage(content="", tool_calls=[
+                    {"name": function["name"], "args": args, "id": uuid.uuid4().hex, "type": "tool_call"}
+                ])
+            else:
+                reply = prose()
+                wait(reply_latency(len(reply.split())))
+                message = AIMessage(content=reply)
+            message.usage_metadata = {
+                "input_tokens": prompt_chars // 4,
+                "output_tokens": settings.output_tokens,
+                "total_tokens": prompt_chars // 4 + settings.output_tokens,
+            }
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    return StubChatModel()